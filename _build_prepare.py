@@ -63,6 +63,9 @@ args = [
     "--hidden-import", "nacl.secret",
     "--hidden-import", "nacl.public",
     "--hidden-import", "psutil",
+    "--hidden-import", "numpy",
+    "--hidden-import", "scipy.signal",
+    "--hidden-import", "scipy.sparse",
     "--hidden-import", "tkinter",
     "--hidden-import", "tkinter.ttk",
     "--hidden-import", "tkinter.scrolledtext",
@@ -201,6 +201,65 @@ TRANSLATIONS = {
         "eb_inline_q":       "Inline? (`yes` / `no`)",
         "eb_another_q":      "Add another field? (`yes` / `no`)",
         "eb_confirm_q":      "Confirm and send? (`yes` / `no`)",
+        "playlist_loading":  "⏳ Loading Playlist",
+        "playlist_progress": "**{n}** tracks queued so far...",
+        "playlist_added":    "📋 Playlist Added",
+        "playlist_added_msg": "**{title}** — **{n}** tracks queued.",
+        "bass_title":        "🎚️ Bass Boost",
+        "bass_set":          "Bass boost set to **{db} dB**",
+        "err_bass_range":    "Bass boost must be between 0 and 12 dB.",
+        "err_no_numpy":      "Audio processing needs NumPy and SciPy (`pip install numpy scipy`).",
+        "dsp_title":         "🎛️ Audio Processing",
+        "dsp_inactive":      "No processing chain is active on this track.",
+        "xf_title":          "🔀 Crossfade",
+        "xf_set":            "Tracks will crossfade over **{s}s**.",
+        "xf_off":            "Crossfade disabled.",
+        "err_xf_range":      "Crossfade must be between 0 and {max} seconds.",
+        "radio_title":       "📻 Radio",
+        "radio_tuned":       "Tuned into **{title}** ({n} listening).",
+        "radio_stopped":     "Left the broadcast.",
+        "err_no_radio":      "Not tuned into a radio broadcast.",
+        "buffer_lbl":        "Read-ahead",
+        "buffer_stats":      "`{depth}s` buffered, {n} underruns",
+        "idle_left":         "Left the voice channel after {m} minutes without music.",
+        "err_queue_dup":     "**{title}** is already in the queue.",
+        "err_queue_full":    "The queue is full ({n} songs).",
+        "err_queue_user_full": "You already have {n} songs queued.",
+        "err_queue_index":   "Pick a queue position between 1 and {n}.",
+        "removed_title":     "🗑️ Removed",
+        "removed_msg":       "Removed **{title}** from the queue.",
+        "moved_title":       "↕️ Moved",
+        "moved_msg":         "**{title}** is now at position **#{pos}**.",
+        "shuffled_title":    "🔀 Shuffled",
+        "shuffled_msg":      "Shuffled {n} songs.",
+        "remaining_lbl":     "Remaining",
+        "queue_page":        "Page {p}/{n}",
+        "progress_lbl":      "Progress",
+        "up_next_lbl":       "⏭️ Up Next",
+        "search_title":      "🔎 Search Results",
+        "search_pick":       "Choose a song…",
+        "search_chosen":     "Picked **{title}**.",
+        "err_no_results":    "No results found.",
+        "local_lbl":         "Local library",
+        "library_title":     "💽 Local Library",
+        "library_info":      "{n} songs indexed. Play one with `local:<query>`.",
+        "library_rescanned": "{n} songs indexed ({probed} new or changed, {removed} removed).",
+        "err_no_library":    "No local library is configured (`library_dir`).",
+        "playlists_title":   "💾 Saved Playlists",
+        "playlists_empty":   "No saved playlists yet. Use `playlist save <name>`.",
+        "playlist_count":    "{n} tracks",
+        "playlist_saved":    "Saved **{n}** tracks as **{name}**.",
+        "playlist_deleted":  "Deleted playlist **{name}**.",
+        "err_playlist_usage": "Usage: `playlist save|load|delete <name>` or `playlist list`.",
+        "err_playlist_missing": "No playlist called **{name}**.",
+        "err_playlist_limit": "This server already has {n} saved playlists.",
+        "history_title":     "🕘 Recently Played",
+        "history_empty":     "Nothing has been played yet.",
+        "err_no_history":    "There is no previous song to play.",
+        "autoplay_title":    "📻 Autoplay",
+        "autoplay_on":       "Autoplay **enabled**: related songs will play when the queue runs out.",
+        "autoplay_off":      "Autoplay **disabled**.",
+        "err_autoplay_deps": "Autoplay needs NumPy and SciPy (`pip install numpy scipy`).",
     },
     "it": {
         "app_title":         "Bot Dashboard",
@@ -391,6 +450,65 @@ TRANSLATIONS = {
         "eb_inline_q":       "Inline? (`si` / `no`)",
         "eb_another_q":      "Aggiungere un altro campo? (`si` / `no`)",
         "eb_confirm_q":      "Confermi e invii? (`si` / `no`)",
+        "playlist_loading":  "⏳ Caricamento Playlist",
+        "playlist_progress": "**{n}** brani in coda finora...",
+        "playlist_added":    "📋 Playlist Aggiunta",
+        "playlist_added_msg": "**{title}** — **{n}** brani in coda.",
+        "bass_title":        "🎚️ Bass Boost",
+        "bass_set":          "Bass boost impostato a **{db} dB**",
+        "err_bass_range":    "Il bass boost deve essere tra 0 e 12 dB.",
+        "err_no_numpy":      "L'elaborazione audio richiede NumPy e SciPy (`pip install numpy scipy`).",
+        "dsp_title":         "🎛️ Elaborazione Audio",
+        "dsp_inactive":      "Nessuna catena di elaborazione attiva su questo brano.",
+        "xf_title":          "🔀 Dissolvenza",
+        "xf_set":            "I brani sfumeranno in **{s}s**.",
+        "xf_off":            "Dissolvenza disattivata.",
+        "err_xf_range":      "La dissolvenza deve essere tra 0 e {max} secondi.",
+        "radio_title":       "📻 Radio",
+        "radio_tuned":       "Sintonizzato su **{title}** ({n} in ascolto).",
+        "radio_stopped":     "Uscito dalla trasmissione.",
+        "err_no_radio":      "Nessuna trasmissione radio in ascolto.",
+        "buffer_lbl":        "Pre-lettura",
+        "buffer_stats":      "`{depth}s` nel buffer, {n} interruzioni",
+        "idle_left":         "Ho lasciato il canale vocale dopo {m} minuti senza musica.",
+        "err_queue_dup":     "**{title}** è già in coda.",
+        "err_queue_full":    "La coda è piena ({n} brani).",
+        "err_queue_user_full": "Hai già {n} brani in coda.",
+        "err_queue_index":   "Scegli una posizione tra 1 e {n}.",
+        "removed_title":     "🗑️ Rimosso",
+        "removed_msg":       "**{title}** rimosso dalla coda.",
+        "moved_title":       "↕️ Spostato",
+        "moved_msg":         "**{title}** ora è in posizione **#{pos}**.",
+        "shuffled_title":    "🔀 Mescolata",
+        "shuffled_msg":      "Mescolati {n} brani.",
+        "remaining_lbl":     "Rimanente",
+        "queue_page":        "Pagina {p}/{n}",
+        "progress_lbl":      "Avanzamento",
+        "up_next_lbl":       "⏭️ Prossimo",
+        "search_title":      "🔎 Risultati della Ricerca",
+        "search_pick":       "Scegli un brano…",
+        "search_chosen":     "Scelto **{title}**.",
+        "err_no_results":    "Nessun risultato trovato.",
+        "local_lbl":         "Libreria locale",
+        "library_title":     "💽 Libreria Locale",
+        "library_info":      "{n} brani indicizzati. Riproducine uno con `local:<ricerca>`.",
+        "library_rescanned": "{n} brani indicizzati ({probed} nuovi o modificati, {removed} rimossi).",
+        "err_no_library":    "Nessuna libreria locale configurata (`library_dir`).",
+        "playlists_title":   "💾 Playlist Salvate",
+        "playlists_empty":   "Nessuna playlist salvata. Usa `playlist save <nome>`.",
+        "playlist_count":    "{n} brani",
+        "playlist_saved":    "Salvati **{n}** brani come **{name}**.",
+        "playlist_deleted":  "Playlist **{name}** eliminata.",
+        "err_playlist_usage": "Uso: `playlist save|load|delete <nome>` o `playlist list`.",
+        "err_playlist_missing": "Nessuna playlist chiamata **{name}**.",
+        "err_playlist_limit": "Questo server ha già {n} playlist salvate.",
+        "history_title":     "🕘 Ascoltati di Recente",
+        "history_empty":     "Non è ancora stato riprodotto nulla.",
+        "err_no_history":    "Non c'è un brano precedente da riprodurre.",
+        "autoplay_title":    "📻 Riproduzione Automatica",
+        "autoplay_on":       "Riproduzione automatica **attivata**: a coda finita partiranno brani correlati.",
+        "autoplay_off":      "Riproduzione automatica **disattivata**.",
+        "err_autoplay_deps": "La riproduzione automatica richiede NumPy e SciPy (`pip install numpy scipy`).",
     },
     "pl": {
         "app_title":         "Panel Bota",
@@ -581,5 +699,64 @@ TRANSLATIONS = {
         "eb_inline_q":       "Inline? (`tak` / `nie`)",
         "eb_another_q":      "Kolejne pole? (`tak` / `nie`)",
         "eb_confirm_q":      "Potwierdź i wyślij? (`tak` / `nie`)",
+        "playlist_loading":  "⏳ Ładowanie Playlisty",
+        "playlist_progress": "Dotąd dodano **{n}** utworów...",
+        "playlist_added":    "📋 Dodano Playlistę",
+        "playlist_added_msg": "**{title}** — dodano **{n}** utworów.",
+        "bass_title":        "🎚️ Bass Boost",
+        "bass_set":          "Bass boost ustawiony na **{db} dB**",
+        "err_bass_range":    "Bass boost musi mieścić się w zakresie 0–12 dB.",
+        "err_no_numpy":      "Przetwarzanie dźwięku wymaga NumPy i SciPy (`pip install numpy scipy`).",
+        "dsp_title":         "🎛️ Przetwarzanie Dźwięku",
+        "dsp_inactive":      "Dla tego utworu nie działa żaden łańcuch przetwarzania.",
+        "xf_title":          "🔀 Przenikanie",
+        "xf_set":            "Utwory będą się przenikać przez **{s}s**.",
+        "xf_off":            "Przenikanie wyłączone.",
+        "err_xf_range":      "Przenikanie musi mieścić się w zakresie 0–{max} sekund.",
+        "radio_title":       "📻 Radio",
+        "radio_tuned":       "Nastrojono na **{title}** ({n} słucha).",
+        "radio_stopped":     "Opuszczono transmisję.",
+        "err_no_radio":      "Nie słuchasz żadnej transmisji radiowej.",
+        "buffer_lbl":        "Bufor",
+        "buffer_stats":      "`{depth}s` w buforze, {n} niedoborów",
+        "idle_left":         "Opuszczono kanał głosowy po {m} minutach bez muzyki.",
+        "err_queue_dup":     "**{title}** jest już w kolejce.",
+        "err_queue_full":    "Kolejka jest pełna ({n} utworów).",
+        "err_queue_user_full": "Masz już {n} utworów w kolejce.",
+        "err_queue_index":   "Wybierz pozycję od 1 do {n}.",
+        "removed_title":     "🗑️ Usunięto",
+        "removed_msg":       "Usunięto **{title}** z kolejki.",
+        "moved_title":       "↕️ Przeniesiono",
+        "moved_msg":         "**{title}** jest teraz na pozycji **#{pos}**.",
+        "shuffled_title":    "🔀 Przetasowano",
+        "shuffled_msg":      "Przetasowano {n} utworów.",
+        "remaining_lbl":     "Pozostało",
+        "queue_page":        "Strona {p}/{n}",
+        "progress_lbl":      "Postęp",
+        "up_next_lbl":       "⏭️ Następny",
+        "search_title":      "🔎 Wyniki Wyszukiwania",
+        "search_pick":       "Wybierz utwór…",
+        "search_chosen":     "Wybrano **{title}**.",
+        "err_no_results":    "Nie znaleziono wyników.",
+        "local_lbl":         "Biblioteka lokalna",
+        "library_title":     "💽 Biblioteka Lokalna",
+        "library_info":      "Zindeksowano {n} utworów. Odtwórz przez `local:<zapytanie>`.",
+        "library_rescanned": "Zindeksowano {n} utworów ({probed} nowych lub zmienionych, {removed} usuniętych).",
+        "err_no_library":    "Nie skonfigurowano biblioteki lokalnej (`library_dir`).",
+        "playlists_title":   "💾 Zapisane Playlisty",
+        "playlists_empty":   "Brak zapisanych playlist. Użyj `playlist save <nazwa>`.",
+        "playlist_count":    "{n} utworów",
+        "playlist_saved":    "Zapisano **{n}** utworów jako **{name}**.",
+        "playlist_deleted":  "Usunięto playlistę **{name}**.",
+        "err_playlist_usage": "Użycie: `playlist save|load|delete <nazwa>` lub `playlist list`.",
+        "err_playlist_missing": "Brak playlisty o nazwie **{name}**.",
+        "err_playlist_limit": "Ten serwer ma już {n} zapisanych playlist.",
+        "history_title":     "🕘 Ostatnio Odtwarzane",
+        "history_empty":     "Nic jeszcze nie zostało odtworzone.",
+        "err_no_history":    "Nie ma poprzedniego utworu do odtworzenia.",
+        "autoplay_title":    "📻 Autoodtwarzanie",
+        "autoplay_on":       "Autoodtwarzanie **włączone**: po końcu kolejki zagrają podobne utwory.",
+        "autoplay_off":      "Autoodtwarzanie **wyłączone**.",
+        "err_autoplay_deps": "Autoodtwarzanie wymaga NumPy i SciPy (`pip install numpy scipy`).",
     },
 }
\ No newline at end of file
@@ -3,6 +3,7 @@ from tkinter import ttk, scrolledtext, messagebox
 import threading
 import asyncio
 import json
+import multiprocessing
 import os
 import sys
 import time
@@ -67,6 +68,9 @@ def load_config() -> dict:
     defaults = {
         "token": "", "prefix": "!", "bot_name": "MyBot",
         "status": "online", "activity": "", "log_level": "INFO", "lang": "en",
+        "audio_cache_dir": "audio_cache", "audio_cache_mb": 0, "opus_passthrough": False,
+        "music_data_dir": "music_data", "stream_buffer": 3.0, "idle_timeout": 300,
+        "queue_max": 5000, "queue_user_max": 500, "library_dir": "",
     }
     if os.path.exists(CONFIG_FILE):
         try:
@@ -933,8 +937,23 @@ class Dashboard(tk.Tk):
             (f"{p}stop",           "Stop and disconnect"),
             (f"{p}queue / {p}q",   "Show queue"),
             (f"{p}volume <0-100>", "Set volume"),
+            (f"{p}bassboost <0-12>","Bass boost in dB"),
+            (f"{p}dsp",            "Audio processing stats"),
+            (f"{p}crossfade <0-12>","Crossfade between tracks"),
+            (f"{p}radio <url|stop>","Shared broadcast radio"),
             (f"{p}loop",           "Toggle loop"),
+            (f"{p}autoplay",       "Toggle autoplay"),
             (f"{p}nowplaying",     "Current song"),
+            (f"{p}search <q>",     "Pick from search results"),
+            (f"{p}library [rescan]","Local music library"),
+            (f"{p}playlist <action> [name]","Saved playlists"),
+            (f"{p}playnext <q>",   "Queue a song to play next"),
+            (f"{p}previous",       "Play the previous song"),
+            (f"{p}replay",         "Restart the song"),
+            (f"{p}history",        "Recently played"),
+            (f"{p}remove <n>",     "Remove from queue"),
+            (f"{p}move <n> <to>",  "Move within queue"),
+            (f"{p}shuffle",        "Shuffle queue"),
             (f"{p}clear_queue",    "Clear queue"),
             (f"{p}join / {p}leave","Connect / Disconnect"),
         ]):
@@ -977,8 +996,23 @@ class Dashboard(tk.Tk):
                 (f"{p}stop",               "Stop and disconnect"),
                 (f"{p}queue / {p}q",       "Show music queue"),
                 (f"{p}volume <0-100>",     "Set volume"),
+                (f"{p}bassboost <0-12>",   "Bass boost in dB"),
+                (f"{p}dsp",                "Audio processing stage timings"),
+                (f"{p}crossfade <0-12>",   "Crossfade seconds (0 = off)"),
+                (f"{p}radio <url|stop>",   "Join a shared broadcast"),
                 (f"{p}loop",               "Toggle loop"),
+                (f"{p}autoplay / {p}ap",   "Keep playing related songs"),
                 (f"{p}nowplaying / {p}np", "Currently playing"),
+                (f"{p}search / {p}find <q>","Pick a song from search results"),
+                (f"{p}library [rescan]",   "Local library size / rescan"),
+                (f"{p}playlist / {p}pl save|load|delete <name>","Saved playlists (list: show all)"),
+                (f"{p}playnext / {p}pn <q>","Queue a song to play next"),
+                (f"{p}previous / {p}prev", "Play the previous song again"),
+                (f"{p}replay",             "Restart the current song"),
+                (f"{p}history / {p}hist",  "Recently played songs"),
+                (f"{p}remove / {p}rm <n>", "Remove entry n from the queue"),
+                (f"{p}move / {p}mv <n> <to>","Move entry n to position to"),
+                (f"{p}shuffle",            "Shuffle the queue"),
                 (f"{p}clear_queue / {p}cq","Clear the queue"),
                 (f"{p}join",               "Join voice channel"),
                 (f"{p}leave / {p}dc",      "Leave voice channel"),
@@ -1184,6 +1218,7 @@ class Dashboard(tk.Tk):
         intents.voice_states     = True
         bot = commands.Bot(command_prefix=self.cfg["prefix"], intents=intents)
         cfg = self.cfg
+        bot.config = cfg
 
         @bot.event
         async def on_ready():
@@ -1265,6 +1300,7 @@ class Dashboard(tk.Tk):
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     try:
         app = Dashboard()
         app.mainloop()
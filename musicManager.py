@@ -1,58 +1,2169 @@
 from i18n import t
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 import asyncio
 import yt_dlp
-from collections import deque
+from collections import deque, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import heapq
+import http.client
+import json
 import logging
+import multiprocessing
+import os
+import math
+import random
+import re
+import shlex
+import socket
+import ssl
+import subprocess
+import threading
+import time
+import urllib.request
+from urllib.parse import urlparse, parse_qs, unquote
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from scipy.signal import sosfilt
+except ImportError:
+    sosfilt = None
+
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
 
 logger = logging.getLogger(__name__)
 
-YTDL_OPTIONS = {
-    "format": "bestaudio/best",
-    "noplaylist": False,
-    "quiet": True,
-    "no_warnings": True,
-    "default_search": "ytsearch",
-    "source_address": "0.0.0.0",
-}
+YTDL_OPTIONS = {
+    "format": "bestaudio[acodec=opus]/bestaudio/best",
+    "noplaylist": False,
+    "quiet": True,
+    "no_warnings": True,
+    "default_search": "ytsearch",
+    "source_address": "0.0.0.0",
+}
+
+FFMPEG_OPTIONS = {
+    "before_options": "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5",
+    "options": "-vn",
+}
+
+RESOLVE_CACHE_SIZE   = 512
+RESOLVE_TTL          = 3600
+RESOLVE_NEGATIVE_TTL = 600
+STREAM_EXPIRY_MARGIN = 300
+PREFETCH_LEAD        = 15
+EXTRACT_WORKERS      = 2
+EXTRACT_TIMEOUT      = 30
+EXTRACT_RECYCLE_JOBS = 50
+PLAYLIST_PAGE_SIZE   = 100
+PLAYLIST_TIMEOUT     = 300
+CACHE_FORMAT         = "bestaudio[acodec=opus]/bestaudio[ext=webm]/bestaudio"
+CACHE_HOT_PLAYS      = 2
+CACHE_MAX_DURATION   = 900
+CACHE_DOWNLOAD_TIMEOUT = 300
+DSP_RAMP_FRAMES      = 5
+DSP_BASS_FREQ        = 100
+DSP_LIMIT_CEILING    = 0.89
+DSP_LIMIT_RELEASE    = 0.05
+CROSSFADE_MAX        = 12
+ANALYSIS_TARGET_LUFS = -14.0
+ANALYSIS_SILENCE_DB  = -50
+ANALYSIS_SILENCE_MIN = 1.0
+ANALYSIS_MAX_DURATION = 900
+ANALYSIS_TIMEOUT     = 180
+ANALYSIS_SAVE_EVERY  = 10
+ENCODER_MAX_KBPS     = 256
+ENCODER_BASE_LOSS    = 0.02
+ENCODER_FEC_LOSS     = 0.05
+ENCODER_LOSS_STEP    = 0.1
+ENCODER_RETUNE_INTERVAL = 30
+OPUS_SET_COMPLEXITY  = 4010
+RADIO_RING_FRAMES    = 250
+OPUS_SILENCE         = b"\xf8\xff\xfe"
+BUFFER_SECONDS       = 3.0
+BUFFER_START_FRAMES  = 10
+OPEN_CHECK_TIMEOUT   = 10
+ADVANCE_RETRIES      = 2
+ADVANCE_MAX_FAILURES = 5
+WATCHDOG_INTERVAL    = 2
+WATCHDOG_STALL       = 6
+IDLE_TIMEOUT         = 300
+REAPER_INTERVAL      = 30
+STATE_TTL            = 1800
+QUEUE_MAX            = 5000
+QUEUE_USER_MAX       = 500
+QUEUE_PAGE_SIZE      = 10
+QUEUE_EDIT_INTERVAL  = 1.0
+QUEUE_VIEW_TIMEOUT   = 180
+NP_DEBOUNCE          = 0.5
+NP_EDIT_INTERVAL     = 1.5
+NP_PROGRESS_INTERVAL = 15
+NP_BAR_WIDTH         = 16
+SEARCH_RESULTS       = 10
+SEARCH_TTL           = 600
+SEARCH_VIEW_TIMEOUT  = 60
+DIRECT_PROBE_TIMEOUT = 4
+DIRECT_TTL           = 6 * 3600
+DIRECT_MEDIA_EXTS    = (".mp3", ".ogg", ".oga", ".opus", ".flac", ".wav", ".m4a", ".aac",
+                        ".webm", ".mka", ".weba")
+LIBRARY_PROBE_WORKERS = 4
+LIBRARY_MIN_SCORE    = 0.5
+PLAYLISTS_PER_GUILD  = 50
+HISTORY_SIZE         = 50
+AUTOPLAY_WINDOW      = 3
+AUTOPLAY_FOLD        = 512
+AUTOPLAY_TOP_K       = 5
+
+_YT_ID_RE = re.compile(
+    r"(?:youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|embed/|live/)|youtu\.be/)([A-Za-z0-9_-]{11})")
+_UNAVAILABLE_MARKERS = ("unavailable", "private video", "been removed",
+                        "copyright", "not available", "members-only")
+
+
+def cache_key(query):
+    """Canonical key for a play query: the video ID for single YouTube
+    videos, the normalized text for searches, the URL for anything else."""
+    if query.startswith("http"):
+        if "list" not in parse_qs(urlparse(query).query):
+            m = _YT_ID_RE.search(query)
+            if m:
+                return f"yt:{m.group(1)}"
+        return query.strip()
+    if query.startswith("ytsearch:"):
+        query = query[len("ytsearch:"):]
+    return "q:" + " ".join(query.lower().split())
+
+
+def fmt_duration(seconds):
+    seconds = int(seconds)
+    h, rest = divmod(seconds, 3600)
+    return f"{h}:{rest // 60:02d}:{rest % 60:02d}" if h else f"{rest // 60}:{rest % 60:02d}"
+
+
+def progress_bar(position, duration, width=NP_BAR_WIDTH):
+    if not duration:
+        return f"🔴 `{fmt_duration(position)}`"
+    filled = min(width - 1, int(position / duration * width))
+    return (f"`{fmt_duration(position)}` {'▬' * filled}🔘{'▬' * (width - filled - 1)} "
+            f"`{fmt_duration(duration)}`")
+
+
+def is_playlist_url(url):
+    parsed = urlparse(url)
+    return "list" in parse_qs(parsed.query) or parsed.path.rstrip("/").endswith(
+        ("/playlist", "/videos")) or "/sets/" in parsed.path
+
+
+def _stream_ttl(data):
+    """Seconds the resolved stream URL stays usable, from its ``expire`` param."""
+    expire = parse_qs(urlparse(data.get("url", "")).query).get("expire")
+    if not expire:
+        return RESOLVE_TTL
+    try:
+        remaining = int(expire[0]) - time.time() - STREAM_EXPIRY_MARGIN
+    except ValueError:
+        return RESOLVE_TTL
+    return max(0, min(RESOLVE_TTL, remaining))
+
+
+class ExtractionError(Exception):
+    """Picklable stand-in for errors raised inside extraction workers."""
+
+
+def _is_unavailable(err):
+    msg = str(err).lower()
+    return isinstance(err, (yt_dlp.utils.DownloadError, ExtractionError)) \
+        and any(m in msg for m in _UNAVAILABLE_MARKERS)
+
+
+class ResolveCache:
+    """LRU cache of resolved lookups with per-entry expiry, a negative cache
+    for unavailable videos and single-flight coalescing of concurrent misses."""
+
+    def __init__(self, maxsize=RESOLVE_CACHE_SIZE, negative_ttl=RESOLVE_NEGATIVE_TTL):
+        self.maxsize      = maxsize
+        self.negative_ttl = negative_ttl
+        self._entries     = OrderedDict()
+        self._inflight    = {}
+        self.hits         = 0
+        self.misses       = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the cached value, raise the cached error, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value, error = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        if error is not None:
+            raise error
+        return value
+
+    def put(self, key, value, ttl=RESOLVE_TTL):
+        if ttl <= 0:
+            self._entries.pop(key, None)
+            return
+        self._store(key, (time.monotonic() + ttl, value, None))
+
+    def put_error(self, key, error):
+        self._store(key, (time.monotonic() + self.negative_ttl, None, error))
+
+    def invalidate(self, key):
+        self._entries.pop(key, None)
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    async def resolve(self, key, factory, *, ttl=None):
+        """Return the value for ``key``, sharing one ``factory()`` call between
+        concurrent callers."""
+        while True:
+            value = self.get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+            pending = self._inflight.get(key)
+            if pending is None:
+                break
+            self.hits += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                if not pending.cancelled():
+                    raise
+                # The leading caller was cancelled; treat it as a miss.
+        self.misses += 1
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            value = await factory()
+        except Exception as err:
+            if _is_unavailable(err):
+                self.put_error(key, err)
+            fut.set_exception(err)
+            fut.exception()
+            raise
+        else:
+            self.put(key, value, ttl(value) if callable(ttl) else (ttl or RESOLVE_TTL))
+            fut.set_result(value)
+            return value
+        finally:
+            if not fut.done():
+                fut.cancel()
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
+
+
+class Track:
+    """Slim record of a track. Only the fields the bot displays or needs to
+    start playback are kept; the yt-dlp info dict is dropped after resolution."""
+    __slots__ = ("id", "title", "url", "duration", "uploader", "thumbnail",
+                 "stream_url", "expires_at", "codec", "requester")
+
+    def __init__(self, url, *, id=None, title="Unknown", duration=0, uploader="Unknown",
+                 thumbnail="", stream_url=None, expires_at=0.0, codec=None, requester=None):
+        self.id         = id
+        self.title      = title
+        self.url        = url
+        self.duration   = duration
+        self.uploader   = uploader
+        self.thumbnail  = thumbnail
+        self.stream_url = stream_url
+        self.expires_at = expires_at
+        self.codec      = codec
+        self.requester  = requester
+
+    @classmethod
+    def from_info(cls, data, requester=None):
+        return cls(
+            data.get("webpage_url") or data.get("url", ""),
+            id         = data.get("id"),
+            title      = data.get("title") or "Unknown",
+            duration   = int(data.get("duration") or 0),
+            uploader   = data.get("uploader") or "Unknown",
+            thumbnail  = data.get("thumbnail") or "",
+            stream_url = data.get("url"),
+            expires_at = time.time() + _stream_ttl(data),
+            codec      = data.get("acodec"),
+            requester  = requester,
+        )
+
+    @classmethod
+    def from_flat(cls, entry, requester=None):
+        """Unresolved track from a flat playlist entry; the stream URL is
+        filled in when the track nears the head of the queue."""
+        url = entry.get("url") or ""
+        if not url.startswith("http") and entry.get("id"):
+            url = f"https://www.youtube.com/watch?v={entry['id']}"
+        return cls(
+            url,
+            id        = entry.get("id"),
+            title     = entry.get("title") or "Unknown",
+            duration  = int(entry.get("duration") or 0),
+            uploader  = entry.get("uploader") or "Unknown",
+            requester = requester,
+        )
+
+    def to_record(self):
+        """Compact form for persistence; the stream URL is not kept."""
+        return {"id": self.id, "url": self.url, "title": self.title, "duration": self.duration}
+
+    @classmethod
+    def from_record(cls, record, requester=None):
+        """Unresolved track from :meth:`to_record` output; resolved when it
+        nears the head of the queue."""
+        return cls(record["url"], id=record.get("id"), title=record.get("title") or "Unknown",
+                   duration=record.get("duration") or 0, requester=requester)
+
+    @property
+    def stream_valid(self):
+        return bool(self.stream_url) and self.expires_at > time.time()
+
+    def with_requester(self, requester):
+        track = Track(self.url)
+        for name in Track.__slots__:
+            setattr(track, name, getattr(self, name))
+        track.requester = requester
+        return track
+
+    def __repr__(self):
+        return f"<Track {self.id or self.url!r} {self.title!r}>"
+
+
+class QueueError(Exception):
+    """A track was refused by :class:`TrackQueue` (duplicate or over a cap)."""
+
+
+class _QNode:
+    __slots__ = ("track", "round", "prio", "size", "max_round", "left", "right")
+
+    def __init__(self, track, rnd):
+        self.track     = track
+        self.round     = rnd
+        self.prio      = random.random()
+        self.size      = 1
+        self.max_round = rnd
+        self.left      = None
+        self.right     = None
+
+
+def _q_update(node):
+    node.size, node.max_round = 1, node.round
+    for child in (node.left, node.right):
+        if child is not None:
+            node.size += child.size
+            node.max_round = max(node.max_round, child.max_round)
+
+
+def _q_split(node, k):
+    """Split into the first ``k`` nodes and the rest."""
+    if node is None:
+        return None, None
+    left = node.left.size if node.left else 0
+    if k <= left:
+        a, node.left = _q_split(node.left, k)
+        _q_update(node)
+        return a, node
+    node.right, b = _q_split(node.right, k - left - 1)
+    _q_update(node)
+    return node, b
+
+
+def _q_merge(a, b):
+    if a is None or b is None:
+        return a or b
+    if a.prio > b.prio:
+        a.right = _q_merge(a.right, b)
+        _q_update(a)
+        return a
+    b.left = _q_merge(a, b.left)
+    _q_update(b)
+    return b
+
+
+def _q_nodes(node):
+    stack = []
+    while stack or node:
+        while node:
+            stack.append(node)
+            node = node.left
+        node = stack.pop()
+        yield node
+        node = node.right
+
+
+class TrackQueue:
+    """Per-guild play queue, round-robin between requesters, held in an
+    implicit treap so indexing, insert, remove and move are O(log n)."""
+
+    def __init__(self, max_size=QUEUE_MAX, per_user=QUEUE_USER_MAX):
+        self.max_size = max_size
+        self.per_user = per_user
+        self.clear()
+
+    def clear(self):
+        self.duration = 0
+        self._root   = None
+        self._keys   = {}
+        self._users  = {}
+        self._rounds = {}
+        self._base   = 0
+
+    def __len__(self):
+        return self._root.size if self._root else 0
+
+    def __iter__(self):
+        return (node.track for node in _q_nodes(self._root))
+
+    def __getitem__(self, index):
+        return self._node(index).track
+
+    def _index(self, index):
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("queue index out of range")
+        return index
+
+    def _node(self, index):
+        index, node = self._index(index), self._root
+        while True:
+            left = node.left.size if node.left else 0
+            if index < left:
+                node = node.left
+            elif index == left:
+                return node
+            else:
+                index -= left + 1
+                node = node.right
+
+    def slice(self, start, stop):
+        """Tracks ``start`` to ``stop`` without walking the rest of the queue."""
+        a, rest = _q_split(self._root, start)
+        b, c = _q_split(rest, max(0, stop - start))
+        tracks = [node.track for node in _q_nodes(b)]
+        self._root = _q_merge(a, _q_merge(b, c))
+        return tracks
+
+    @staticmethod
+    def _key(track):
+        return track.id or track.url
+
+    def room(self, requester):
+        """How many more tracks ``requester`` may queue; None if uncapped."""
+        caps = []
+        if self.max_size:
+            caps.append(self.max_size - len(self))
+        if self.per_user:
+            caps.append(self.per_user - self._users.get(requester, 0))
+        return max(0, min(caps)) if caps else None
+
+    def _admit(self, track):
+        if self._keys.get(self._key(track)):
+            raise QueueError(t("err_queue_dup", title=track.title))
+        if self.max_size and len(self) >= self.max_size:
+            raise QueueError(t("err_queue_full", n=self.max_size))
+        if self.per_user and self._users.get(track.requester, 0) >= self.per_user:
+            raise QueueError(t("err_queue_user_full", n=self.per_user))
+        self._count(track, 1)
+
+    def _count(self, track, delta):
+        self.duration += delta * (track.duration or 0)
+        key = self._key(track)
+        self._keys[key] = self._keys.get(key, 0) + delta
+        if not self._keys[key]:
+            del self._keys[key]
+        user = track.requester
+        self._users[user] = self._users.get(user, 0) + delta
+        if not self._users[user]:
+            del self._users[user]
+            self._rounds.pop(user, None)
+
+    def _insert(self, index, node):
+        a, b = _q_split(self._root, index)
+        self._root = _q_merge(_q_merge(a, node), b)
+
+    def _detach(self, index):
+        a, rest = _q_split(self._root, index)
+        node, b = _q_split(rest, 1)
+        self._root = _q_merge(a, b)
+        return node
+
+    def push(self, track):
+        """Queue ``track`` at its fair position; returns that 1-based position."""
+        self._admit(track)
+        rnd = max(self._base, self._rounds.get(track.requester, self._base - 1) + 1)
+        self._rounds[track.requester] = rnd
+        index, node = 0, self._root
+        while node:
+            left = node.left.size if node.left else 0
+            if node.left and node.left.max_round > rnd:
+                node = node.left
+            elif node.round > rnd:
+                index += left
+                break
+            else:
+                index += left + 1
+                node = node.right
+        self._insert(index, _QNode(track, rnd))
+        return index + 1
+
+    def push_next(self, track):
+        """Queue ``track`` to play next, ahead of the fair order."""
+        self._admit(track)
+        self._insert(0, _QNode(track, self._base))
+        return 1
+
+    def extend(self, tracks):
+        """Push every track that is accepted; returns how many were."""
+        added = 0
+        for track in tracks:
+            try:
+                self.push(track)
+            except QueueError:
+                continue
+            added += 1
+        return added
+
+    def popleft(self):
+        if not self._root:
+            raise IndexError("pop from an empty queue")
+        node = self._detach(0)
+        self._base = max(self._base, node.round)
+        self._count(node.track, -1)
+        return node.track
+
+    def remove(self, index):
+        node = self._detach(self._index(index))
+        self._count(node.track, -1)
+        return node.track
+
+    def move(self, src, dst):
+        """Move the track at ``src`` so it ends up at index ``dst``."""
+        node = self._detach(self._index(src))
+        dst = min(max(dst, 0), len(self))
+        # Take the round of the new neighbourhood so rounds stay ordered
+        # along the queue, which push() relies on.
+        node.round = self._node(dst - 1).round if dst else self._base
+        _q_update(node)
+        self._insert(dst, node)
+        return node.track
+
+    def shuffle(self):
+        """Shuffle in place. Fairness starts over: every track is put in the
+        current round."""
+        nodes = list(_q_nodes(self._root))
+        random.shuffle(nodes)
+        self._root, self._rounds = None, {}
+        for node in nodes:
+            node.left = node.right = None
+            node.round = self._base
+            _q_update(node)
+            self._root = _q_merge(self._root, node)
+
+
+# -- extraction workers ------------------------------------------------------
+# These run inside the process pool. Each worker process builds its own
+# YoutubeDL instance once and returns only small, picklable dicts.
+
+_INFO_FIELDS = ("id", "title", "webpage_url", "url", "duration", "uploader", "thumbnail",
+                "acodec")
+_FLAT_SKIP   = ("[Private video]", "[Deleted video]")
+_worker_ytdl = None
+_worker_flat = None
+_worker_dl   = None
+
+
+def _worker_init():
+    global _worker_ytdl, _worker_flat
+    _worker_ytdl = yt_dlp.YoutubeDL(YTDL_OPTIONS)
+    _worker_flat = yt_dlp.YoutubeDL({**YTDL_OPTIONS, "extract_flat": "in_playlist"})
+
+
+def _worker_ping():
+    return True
+
+
+def _worker_extract(query):
+    try:
+        data = _worker_ytdl.extract_info(query, download=False)
+        if "entries" in data:
+            data = data["entries"][0]
+    except Exception as err:
+        raise ExtractionError(str(err)) from None
+    return {k: data.get(k) for k in _INFO_FIELDS}
+
+
+def _worker_extract_flat(url, start, end=None):
+    """Entries ``start`` to ``end`` (1-based, inclusive; None for the rest)
+    of a playlist, without resolving them."""
+    _worker_flat.params["playlist_items"] = f"{start}-{end or ''}"
+    try:
+        data = _worker_flat.extract_info(url, download=False)
+    except Exception as err:
+        raise ExtractionError(str(err)) from None
+    raw, entries = list(data.get("entries") or ()), []
+    for e in raw:
+        if not e or e.get("title") in _FLAT_SKIP:
+            continue
+        entries.append({
+            "id":       e.get("id"),
+            "title":    e.get("title"),
+            "url":      e.get("url") or e.get("webpage_url"),
+            "duration": e.get("duration"),
+            "uploader": e.get("uploader") or e.get("channel"),
+        })
+    return {"title": data.get("title"), "entries": entries, "fetched": len(raw)}
+
+
+def _worker_download(url, outtmpl):
+    """Download the native audio stream of ``url`` to ``outtmpl``; returns the path."""
+    global _worker_dl
+    if _worker_dl is None:
+        _worker_dl = yt_dlp.YoutubeDL({**YTDL_OPTIONS, "format": CACHE_FORMAT, "noplaylist": True})
+    _worker_dl.params["outtmpl"] = {"default": outtmpl}
+    try:
+        data = _worker_dl.extract_info(url, download=True)
+    except Exception as err:
+        raise ExtractionError(str(err)) from None
+    return data["requested_downloads"][0]["filepath"]
+
+
+class ExtractionEngine:
+    """Bounded yt-dlp process pool, dispatched round-robin between guilds
+    and recycled after ``recycle_after`` jobs or a timeout."""
+
+    def __init__(self, workers=EXTRACT_WORKERS, timeout=EXTRACT_TIMEOUT,
+                 recycle_after=EXTRACT_RECYCLE_JOBS):
+        self.workers       = workers
+        self.timeout       = timeout
+        self.recycle_after = recycle_after
+        self._pool         = None
+        self._jobs         = 0
+        self._running      = 0
+        self._pending      = {}
+        self._ready        = deque()
+        self._busy         = {}
+        self._hung         = {}
+
+    def start(self):
+        """Create the pool and spawn its workers ahead of the first job."""
+        pool = self._get_pool()
+        for _ in range(self.workers):
+            pool.submit(_worker_ping)
+
+    def shutdown(self):
+        if self._pool:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        for procs in self._hung.values():
+            for proc in procs:
+                proc.terminate()
+        self._hung.clear()
+        for q in self._pending.values():
+            for _, _, (fut, _) in q:
+                fut.cancel()
+        self._pending.clear()
+        self._ready.clear()
+
+    async def submit(self, key, fn, *args, timeout=None):
+        fut = asyncio.get_running_loop().create_future()
+        q = self._pending.get(key)
+        if q is None:
+            q = self._pending[key] = deque()
+            self._ready.append(key)
+        q.append((fn, args, (fut, timeout or self.timeout)))
+        self._pump()
+        return await fut
+
+    def _pump(self):
+        while self._running < self.workers and self._ready:
+            key = self._ready.popleft()
+            q = self._pending[key]
+            fn, args, (fut, timeout) = q.popleft()
+            if q:
+                self._ready.append(key)
+            else:
+                del self._pending[key]
+            if fut.cancelled():
+                continue
+            self._running += 1
+            asyncio.get_running_loop().create_task(self._run(fn, args, fut, timeout))
+
+    async def _run(self, fn, args, fut, timeout):
+        pool = self._get_pool()
+        self._busy[pool] = self._busy.get(pool, 0) + 1
+        try:
+            result = await asyncio.wait_for(
+                asyncio.wrap_future(pool.submit(fn, *args)), timeout)
+        except asyncio.TimeoutError:
+            # New jobs go to a fresh pool; the hung worker is killed once
+            # the other guilds' jobs on this one have finished.
+            self._hung[pool] = list((getattr(pool, "_processes", None) or {}).values())
+            self._retire(pool)
+            if not fut.done():
+                fut.set_exception(ExtractionError("Extraction timed out"))
+        except BrokenProcessPool:
+            self._retire(pool, kill=True)
+            if not fut.done():
+                fut.set_exception(ExtractionError("Extraction worker crashed"))
+        except Exception as err:
+            if not fut.done():
+                fut.set_exception(err)
+        else:
+            if not fut.done():
+                fut.set_result(result)
+        finally:
+            self._busy[pool] -= 1
+            if not self._busy[pool]:
+                del self._busy[pool]
+                for proc in self._hung.pop(pool, ()):
+                    proc.terminate()
+            self._running -= 1
+            self._pump()
+
+    def _get_pool(self):
+        if self._pool is not None and self._jobs >= self.workers * self.recycle_after:
+            self._retire(self._pool)
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_worker_init,
+                mp_context=multiprocessing.get_context("spawn"))
+            self._jobs = 0
+        self._jobs += 1
+        return self._pool
+
+    def _retire(self, pool, kill=False):
+        if pool is self._pool:
+            self._pool = None
+        if kill:
+            # A hung worker never returns; shutdown() alone would leak it.
+            for proc in list((getattr(pool, "_processes", None) or {}).values()):
+                proc.terminate()
+        pool.shutdown(wait=False, cancel_futures=kill)
+
+
+extraction_engine = ExtractionEngine()
+download_engine   = ExtractionEngine(workers=1, timeout=CACHE_DOWNLOAD_TIMEOUT)
+resolve_cache     = ResolveCache()
+
+
+_extractors = None
+
+
+def _has_extractor(url):
+    """Whether a site-specific yt-dlp extractor claims ``url``; anything
+    left to the generic extractor may be a direct stream."""
+    global _extractors
+    if _extractors is None:
+        _extractors = [ie for ie in yt_dlp.extractor.gen_extractor_classes()
+                       if ie.ie_key() != "Generic"]
+    return any(ie.suitable(url) for ie in _extractors)
+
+
+def _probe_headers(url):
+    """Response headers of ``url`` if it serves audio (including Icecast
+    streams), else None. Only the headers are read."""
+    req = urllib.request.Request(url, headers={
+        "User-Agent": "Mozilla/5.0", "Icy-MetaData": "1", "Range": "bytes=0-"})
+    try:
+        with urllib.request.urlopen(req, timeout=DIRECT_PROBE_TIMEOUT) as resp:
+            headers = resp.headers
+    except http.client.BadStatusLine as err:
+        return _probe_icy(url) if str(err.line).startswith("ICY") else None
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+    ctype = (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+    if ctype.startswith("audio/") or ctype == "application/ogg" or headers.get("icy-name"):
+        return headers
+    return None
+
+
+def _probe_icy(url):
+    """Headers of a SHOUTcast server answering ``ICY 200 OK``, a status
+    line http.client refuses. Such a server is always a raw stream."""
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    path = (parsed.path or "/") + (f"?{parsed.query}" if parsed.query else "")
+    request = (f"GET {path} HTTP/1.0\r\nHost: {parsed.netloc}\r\n"
+               "User-Agent: Mozilla/5.0\r\nIcy-MetaData: 1\r\n\r\n").encode()
+    try:
+        sock = socket.create_connection((parsed.hostname, port), timeout=DIRECT_PROBE_TIMEOUT)
+        if parsed.scheme == "https":
+            sock = ssl.create_default_context().wrap_socket(sock, server_hostname=parsed.hostname)
+        with sock, sock.makefile("rb") as fp:
+            sock.sendall(request)
+            if not fp.readline(1024).startswith(b"ICY 200"):
+                return None
+            return http.client.parse_headers(fp)
+    except (OSError, ValueError, http.client.HTTPException):
+        return None
+
+
+async def probe_direct(url):
+    """Track for a URL FFmpeg can open as is, or None if it needs yt-dlp."""
+    if await asyncio.to_thread(_has_extractor, url):
+        return None
+    parsed = urlparse(url)
+    host = (parsed.hostname or "").lower()
+    headers = {}
+    if not parsed.path.lower().endswith(DIRECT_MEDIA_EXTS):
+        headers = await asyncio.to_thread(_probe_headers, url)
+        if headers is None:
+            return None
+    name = unquote(os.path.basename(parsed.path)) or host
+    info = await ffprobe(url) or {}
+    return Track(url, title=info.get("title") or headers.get("icy-name")
+                 or os.path.splitext(name)[0] or url,
+                 uploader=info.get("artist") or headers.get("icy-description") or host,
+                 duration=info.get("duration", 0), codec=info.get("codec"),
+                 stream_url=url, expires_at=time.time() + DIRECT_TTL)
+
+
+async def ffprobe(path):
+    """Duration, codec and title/artist/album tags of a file or URL, or
+    None if ffprobe is missing or can't read it."""
+    args = ["ffprobe", "-v", "error", "-select_streams", "a:0", "-show_entries",
+            "format=duration:format_tags=title,artist,album:stream=codec_name", "-of", "json", path]
+    if path.startswith("http"):
+        args[1:1] = ["-rw_timeout", str(DIRECT_PROBE_TIMEOUT * 1000000)]
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return None
+    try:
+        out, _ = await asyncio.wait_for(proc.communicate(), DIRECT_PROBE_TIMEOUT * 2)
+        data = json.loads(out or b"{}")
+    except (asyncio.TimeoutError, ValueError):
+        proc.kill()
+        return None
+    if proc.returncode != 0:
+        return None
+    fmt, streams = data.get("format") or {}, data.get("streams") or [{}]
+    tags = {k.lower(): v for k, v in (fmt.get("tags") or {}).items()}
+    try:
+        duration = int(float(fmt.get("duration") or 0))
+    except ValueError:
+        duration = 0
+    return {"duration": duration, "codec": streams[0].get("codec_name"),
+            "title": tags.get("title"), "artist": tags.get("artist"), "album": tags.get("album")}
+
+
+async def resolve_track(query, *, guild_id=None, requester=None):
+    """Resolve a URL or ``ytsearch:`` query to a :class:`Track`, through
+    :data:`resolve_cache` and :data:`extraction_engine`."""
+    key = cache_key(query)
+
+    async def _extract():
+        if query.startswith("http"):
+            track = await probe_direct(query)
+            if track is not None:
+                return track
+        track = Track.from_info(
+            await extraction_engine.submit(guild_id, _worker_extract, query))
+        if track.id and key != f"yt:{track.id}":
+            resolve_cache.put(f"yt:{track.id}", track, track.expires_at - time.time())
+        return track
+
+    track = await resolve_cache.resolve(
+        key, _extract, ttl=lambda tr: tr.expires_at - time.time())
+    return track.with_requester(requester)
+
+
+async def search_tracks(query, *, guild_id=None, limit=SEARCH_RESULTS):
+    """Unresolved ``ytsearchN:`` candidates for ``query``, cached for ``SEARCH_TTL``."""
+    async def _search():
+        page = await extraction_engine.submit(
+            guild_id, _worker_extract_flat, f"ytsearch{limit}:{query}", 1, limit)
+        return [Track.from_flat(entry) for entry in page["entries"]]
+
+    return await resolve_cache.resolve(f"search{limit}:{cache_key(query)}", _search,
+                                       ttl=SEARCH_TTL)
+
+
+def _load_json(path, default):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _save_json(path, obj):
+    """Write ``obj`` to ``path`` atomically."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+_CACHE_FILE_RE = re.compile(r"[A-Za-z0-9_-]{11}\.\w+")
+
+
+class AudioCache:
+    """LRU on-disk cache of hot tracks in their native format, keyed by video ID."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory  = directory
+        self.max_bytes  = max_bytes
+        self._index     = OrderedDict()
+        self._plays     = {}
+        self._pending   = set()
+        self._dirty     = False
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    @property
+    def size(self):
+        return sum(e["size"] for e in self._index.values())
+
+    def _index_path(self):
+        return os.path.join(self.directory, "index.json")
+
+    def _load(self):
+        for e in _load_json(self._index_path(), []):
+            if os.path.exists(os.path.join(self.directory, e["file"])):
+                self._index[e["id"]] = e
+        known = {e["file"] for e in self._index.values()}
+        for name in os.listdir(self.directory):
+            if name not in known and (".dl." in name or name.endswith(".tmp")
+                                      or _CACHE_FILE_RE.fullmatch(name)):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
+
+    def save(self):
+        if not self._dirty:
+            return
+        _save_json(self._index_path(), list(self._index.values()))
+        self._dirty = False
+
+    def path_for(self, video_id):
+        """Local file for ``video_id``, or None. Counts as a use for LRU."""
+        entry = self._index.get(video_id) if video_id else None
+        if entry is None:
+            return None
+        path = os.path.join(self.directory, entry["file"])
+        if not os.path.exists(path):
+            del self._index[video_id]
+            self._dirty = True
+            return None
+        self._index.move_to_end(video_id)
+        entry["hits"] += 1
+        self._dirty = True
+        return path
+
+    def peek(self, video_id):
+        """Local file for ``video_id`` without counting it as a use."""
+        entry = self._index.get(video_id) if video_id else None
+        return os.path.join(self.directory, entry["file"]) if entry else None
+
+    def is_hot(self, track, looping=False):
+        """Record a play of ``track`` and tell whether it is worth caching."""
+        if not track.id or track.id in self._index or track.id in self._pending:
+            return False
+        if not 0 < track.duration <= CACHE_MAX_DURATION:
+            return False
+        self._plays[track.id] = plays = self._plays.get(track.id, 0) + 1
+        return looping or plays >= CACHE_HOT_PLAYS
+
+    async def store(self, track, guild_id=None):
+        self._pending.add(track.id)
+        try:
+            tmp = await download_engine.submit(
+                guild_id, _worker_download, track.url,
+                os.path.join(self.directory, f"{track.id}.dl.%(ext)s"))
+            ext  = os.path.splitext(tmp)[1]
+            name = f"{track.id}{ext}"
+            os.replace(tmp, os.path.join(self.directory, name))
+            self._index[track.id] = {"id": track.id, "file": name,
+                                     "size": os.path.getsize(os.path.join(self.directory, name)),
+                                     "hits": 0}
+            self._plays.pop(track.id, None)
+            self._dirty = True
+            self._evict()
+            self.save()
+        except Exception as err:
+            logger.warning(f"Audio cache download failed for {track.id}: {err}")
+        finally:
+            self._pending.discard(track.id)
+
+    def _evict(self):
+        total = self.size
+        while total > self.max_bytes and self._index:
+            _, entry = self._index.popitem(last=False)
+            total -= entry["size"]
+            try:
+                os.remove(os.path.join(self.directory, entry["file"]))
+            except OSError:
+                pass
+            self._dirty = True
+
+
+_LUFS_RE          = re.compile(r"I:\s+(-?\d+(?:\.\d+)?) LUFS")
+_SILENCE_START_RE = re.compile(r"silence_start: (-?\d+(?:\.\d+)?)")
+_SILENCE_END_RE   = re.compile(r"silence_end: (\d+(?:\.\d+)?)")
+
+
+class LevelAnalyser:
+    """Measures loudness and leading/trailing silence of played tracks in
+    the background, persisted by video ID."""
+
+    def __init__(self, path):
+        self.path     = path
+        self._levels  = _load_json(path, {})
+        self._queue   = deque()
+        self._queued  = set()
+        self._task    = None
+        self._unsaved = 0
+
+    def get(self, video_id):
+        return self._levels.get(video_id) if video_id else None
+
+    def submit(self, track, local_path=None):
+        if not track.id or track.id in self._levels or track.id in self._queued:
+            return
+        if not 0 < track.duration <= ANALYSIS_MAX_DURATION:
+            return
+        if local_path is None and not track.stream_valid:
+            return
+        self._queued.add(track.id)
+        self._queue.append((track, local_path))
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def save(self):
+        if not self._unsaved:
+            return
+        _save_json(self.path, self._levels)
+        self._unsaved = 0
+
+    def close(self):
+        if self._task:
+            self._task.cancel()
+        self.save()
+
+    async def _run(self):
+        while self._queue:
+            track, local_path = self._queue.popleft()
+            try:
+                levels = await self._measure(
+                    local_path or track.stream_url, track.duration, local=local_path is not None)
+                if levels:
+                    self._levels[track.id] = levels
+                    self._unsaved += 1
+                    if self._unsaved >= ANALYSIS_SAVE_EVERY:
+                        self.save()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                logger.debug(f"Level analysis failed for {track.id}: {err}")
+            finally:
+                self._queued.discard(track.id)
+        self.save()
+
+    async def _measure(self, path, duration, *, local):
+        args = ["ffmpeg", "-hide_banner", "-nostats", "-threads", "1"]
+        if not local:
+            args += shlex.split(FFMPEG_OPTIONS["before_options"])
+        args += ["-i", path, "-vn", "-af",
+                 f"silencedetect=noise={ANALYSIS_SILENCE_DB}dB:d={ANALYSIS_SILENCE_MIN},ebur128",
+                 "-f", "null", "-"]
+        if os.name == "nt":
+            kwargs = {"creationflags": subprocess.BELOW_NORMAL_PRIORITY_CLASS
+                      | subprocess.CREATE_NO_WINDOW}
+        else:
+            kwargs = {"preexec_fn": lambda: os.nice(10)}
+        proc = await asyncio.create_subprocess_exec(
+            *args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, **kwargs)
+        try:
+            _, err = await asyncio.wait_for(proc.communicate(), ANALYSIS_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            proc.kill()
+            raise
+        text = err.decode("utf-8", "replace")
+        lufs = _LUFS_RE.findall(text)
+        if proc.returncode != 0 or not lufs:
+            return None
+        starts = [float(x) for x in _SILENCE_START_RE.findall(text)]
+        ends   = [float(x) for x in _SILENCE_END_RE.findall(text)]
+        lead = tail = 0.0
+        if starts and starts[0] <= 0.1 and ends:
+            lead = ends[0]
+        if starts and starts[-1] > 0.1 and (len(starts) > len(ends) or ends[-1] >= duration - 0.5):
+            tail = max(0.0, duration - starts[-1])
+        gain = 10 ** ((ANALYSIS_TARGET_LUFS - float(lufs[-1])) / 20)
+        return {"gain": round(min(2.0, max(0.25, gain)), 3),
+                "lead": round(lead, 2), "tail": round(tail, 2)}
+
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def _trigrams(text):
+    grams = set()
+    for word in _words(text):
+        if len(word) < 3:
+            grams.add(word)
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return grams
+
+
+class LocalLibrary:
+    """Audio files under ``directory``, indexed by tags and searched through
+    an in-memory trigram index."""
+
+    def __init__(self, directory, path):
+        self.directory = directory
+        self.path      = path
+        self._index    = _load_json(path, {})
+        self._entries  = []
+        self._words    = []
+        self._grams    = {}
+        self._lock     = asyncio.Lock()
+        self._reindex()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, rel):
+        return rel in self._index
+
+    def save(self):
+        _save_json(self.path, self._index)
+
+    def _walk(self):
+        found = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.lower().endswith(DIRECT_MEDIA_EXTS):
+                    continue
+                full = os.path.join(root, name)
+                try:
+                    st = os.stat(full)
+                except OSError:
+                    continue
+                found[os.path.relpath(full, self.directory)] = (st.st_mtime, st.st_size)
+        return found
+
+    async def scan(self):
+        """Bring the index up to date; returns (probed, removed) counts."""
+        async with self._lock:
+            found   = await asyncio.to_thread(self._walk)
+            removed = [rel for rel in self._index if rel not in found]
+            changed = [rel for rel, (mtime, size) in found.items()
+                       if (self._index.get(rel) or {}).get("mtime") != mtime
+                       or self._index[rel]["size"] != size]
+            for rel in removed:
+                del self._index[rel]
+            sem = asyncio.Semaphore(LIBRARY_PROBE_WORKERS)
+
+            async def _probe(rel):
+                async with sem:
+                    info = await ffprobe(os.path.join(self.directory, rel)) or {}
+                mtime, size = found[rel]
+                self._index[rel] = {
+                    "mtime": mtime, "size": size,
+                    "title": info.get("title") or os.path.splitext(os.path.basename(rel))[0],
+                    "artist": info.get("artist") or "", "album": info.get("album") or "",
+                    "duration": info.get("duration", 0), "codec": info.get("codec")}
+
+            await asyncio.gather(*(_probe(rel) for rel in changed))
+            if changed or removed:
+                self._reindex()
+                self.save()
+            return len(changed), len(removed)
+
+    def _reindex(self):
+        self._entries, self._words, self._grams = [], [], {}
+        for i, (rel, e) in enumerate(self._index.items()):
+            text = f"{e['title']} {e['artist']} {e['album']} {os.path.splitext(rel)[0]}"
+            self._entries.append(rel)
+            self._words.append(set(_words(text)))
+            for gram in _trigrams(text):
+                self._grams.setdefault(gram, []).append(i)
+
+    def search(self, query, limit=1):
+        """Best matching relative paths: trigram hits plus a bonus for
+        whole words, ignoring weak matches."""
+        grams = _trigrams(query)
+        if not grams:
+            return []
+        scores = {}
+        for gram in grams:
+            for i in self._grams.get(gram, ()):
+                scores[i] = scores.get(i, 0) + 1
+        words = set(_words(query))
+        hits  = [i for i, n in scores.items() if n >= len(grams) * LIBRARY_MIN_SCORE]
+        best  = heapq.nlargest(limit, hits, key=lambda i: scores[i] + 2 * len(words & self._words[i]))
+        return [self._entries[i] for i in best]
+
+    def track(self, rel, requester=None):
+        e = self._index[rel]
+        return Track(f"local:{rel}", title=e["title"], duration=e["duration"],
+                     uploader=e["artist"] or e["album"] or t("local_lbl"),
+                     stream_url=os.path.join(self.directory, rel),
+                     expires_at=math.inf, codec=e["codec"], requester=requester)
+
+
+class PlaylistStore:
+    """Saved playlists per guild, persisted as compact track records."""
+
+    def __init__(self, path):
+        self.path       = path
+        self._playlists = _load_json(path, {})
+
+    def save(self):
+        _save_json(self.path, self._playlists)
+
+    def names(self, guild_id):
+        return {name: len(records)
+                for name, records in self._playlists.get(str(guild_id), {}).items()}
+
+    def get(self, guild_id, name):
+        return self._playlists.get(str(guild_id), {}).get(name.lower())
+
+    def put(self, guild_id, name, tracks):
+        """Store ``tracks`` under ``name``; False if the guild is at its limit."""
+        guild = self._playlists.setdefault(str(guild_id), {})
+        if name.lower() not in guild and len(guild) >= PLAYLISTS_PER_GUILD:
+            return False
+        guild[name.lower()] = [track.to_record() for track in tracks]
+        self.save()
+        return True
+
+    def delete(self, guild_id, name):
+        guild = self._playlists.get(str(guild_id), {})
+        if guild.pop(name.lower(), None) is None:
+            return False
+        if not guild:
+            del self._playlists[str(guild_id)]
+        self.save()
+        return True
+
+
+class AutoplayModel:
+    """Which tracks get played after which, as a sparse co-occurrence
+    matrix learned from every guild's history."""
+
+    def __init__(self, path):
+        self.path     = path
+        self._vocab   = {}
+        self._records = []
+        self._pending = {}
+        self._npending = 0
+        self._unsaved = 0
+        self._matrix  = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self._records = _load_json(path + ".json", [])
+        try:
+            self._matrix = sparse.load_npz(path + ".npz").tocsr().astype(np.float32)
+        except FileNotFoundError:
+            pass
+        except Exception as err:
+            # A corrupt matrix restarts the weights, not the cog load.
+            logger.warning(f"Autoplay model unreadable, starting empty: {err}")
+        self._keys  = [TrackQueue._key(Track.from_record(r)) for r in self._records]
+        self._vocab = {key: i for i, key in enumerate(self._keys)}
+        n = len(self._records)
+        if self._matrix.shape != (n, n):
+            self._matrix.resize((n, n))
+
+    def _index(self, track):
+        key = TrackQueue._key(track)
+        i = self._vocab.get(key)
+        if i is None:
+            i = self._vocab[key] = len(self._records)
+            self._records.append(track.to_record())
+            self._keys.append(key)
+        return i
+
+    def observe(self, history):
+        """Learn from ``history[-1]`` having been played after the tracks
+        before it."""
+        if len(history) < 2:
+            return
+        j = self._index(history[-1])
+        for d in range(1, min(AUTOPLAY_WINDOW, len(history) - 1) + 1):
+            i, w = self._index(history[-1 - d]), 1.0 / d
+            if i == j:
+                continue
+            for a, b, weight in ((i, j, w), (j, i, w / 2)):
+                row = self._pending.setdefault(a, {})
+                row[b] = row.get(b, 0.0) + weight
+                self._npending += 1
+        self._unsaved += 1
+        if self._npending >= AUTOPLAY_FOLD:
+            self.fold()
+
+    def fold(self):
+        """Merge pending observations into the CSR matrix."""
+        n = len(self._records)
+        if self._matrix.shape != (n, n):
+            self._matrix.resize((n, n))
+        if not self._pending:
+            return
+        rows, cols, vals = [], [], []
+        for i, row in self._pending.items():
+            for j, w in row.items():
+                rows.append(i)
+                cols.append(j)
+                vals.append(w)
+        self._matrix = (self._matrix + sparse.csr_matrix(
+            (np.array(vals, dtype=np.float32), (rows, cols)), shape=(n, n))).tocsr()
+        self._pending, self._npending = {}, 0
+
+    def suggest(self, seeds, exclude):
+        """Record likely to follow ``seeds`` (most recent first) and not in
+        ``exclude``, or None."""
+        m = self._matrix
+        for seed in seeds:
+            i = self._vocab.get(TrackQueue._key(seed))
+            if i is None:
+                continue
+            weights = {}
+            if i < m.shape[0]:
+                start, end = m.indptr[i], m.indptr[i + 1]
+                weights = dict(zip(m.indices[start:end].tolist(), m.data[start:end].tolist()))
+            for j, w in self._pending.get(i, {}).items():
+                weights[j] = weights.get(j, 0.0) + w
+            cands = [(w, j) for j, w in weights.items() if self._keys[j] not in exclude]
+            if not cands:
+                continue
+            top = heapq.nlargest(AUTOPLAY_TOP_K, cands)
+            p = np.array([w for w, _ in top], dtype=np.float64)
+            return self._records[top[np.random.choice(len(top), p=p / p.sum())][1]]
+        return None
+
+    def save(self):
+        if not self._unsaved:
+            return
+        self.fold()
+        tmp = self.path + ".tmp.npz"
+        sparse.save_npz(tmp, self._matrix)
+        os.replace(tmp, self.path + ".npz")
+        _save_json(self.path + ".json", self._records)
+        self._unsaved = 0
+
+
+def encoder_profile(channel_bitrate, loss):
+    """Opus encoder settings sized to the channel bitrate and expected loss."""
+    kbps = max(16, min(ENCODER_MAX_KBPS, (channel_bitrate or 64000) // 1000))
+    if kbps < 32:
+        complexity, bandwidth = 4, "wide"
+    elif kbps < 64:
+        complexity, bandwidth = 6, "superwide"
+    elif kbps < 128:
+        complexity, bandwidth = 8, "full"
+    else:
+        complexity, bandwidth = 10, "full"
+    return {"kbps": kbps, "complexity": complexity, "bandwidth": bandwidth,
+            "fec": loss >= ENCODER_FEC_LOSS, "loss": loss}
+
+
+def _link_loss(voice_client, previous=None):
+    """Expected packet loss, guessed from voice latency spikes. It only moves
+    off ``previous`` by at least ``ENCODER_LOSS_STEP``."""
+    avg, cur = voice_client.average_latency, voice_client.latency
+    if not (math.isfinite(avg) and math.isfinite(cur)) or avg <= 0:
+        loss = ENCODER_BASE_LOSS
+    else:
+        loss = min(0.3, ENCODER_BASE_LOSS + max(0.0, cur / avg - 1) * 0.1)
+    if previous is not None and abs(loss - previous) < ENCODER_LOSS_STEP:
+        return previous
+    return round(loss, 2)
+
+
+def apply_encoder_profile(encoder, profile):
+    encoder.set_bitrate(profile["kbps"])
+    encoder.set_bandwidth(profile["bandwidth"])
+    encoder.set_fec(profile["fec"])
+    if profile["fec"]:
+        encoder.set_expected_packet_loss_percent(profile["loss"])
+    try:
+        discord.opus._lib.opus_encoder_ctl(encoder._state, OPUS_SET_COMPLEXITY,
+                                           profile["complexity"])
+    except Exception:
+        pass
+
+
+# -- DSP chain -----------------------------------------------------------------
+# Stages work in place on one 20 ms stereo frame held as a (960, 2) float32
+# array. Every buffer they need is allocated once, up front.
+
+FRAME_SAMPLES = discord.opus.Encoder.SAMPLES_PER_FRAME
+SAMPLE_RATE   = discord.opus.Encoder.SAMPLING_RATE
+
+
+class DSPStage:
+    """One processing step. ``cpu_us`` is a moving average of the time the
+    stage spends per frame, in microseconds."""
+    name = "stage"
+
+    def __init__(self):
+        self.cpu_us = 0.0
+
+    def process(self, buf):
+        raise NotImplementedError
+
+
+class RampVolume(DSPStage):
+    """Volume that glides to a new target over a few frames instead of jumping."""
+    name = "volume"
+
+    def __init__(self, volume):
+        super().__init__()
+        self.current = self.target = volume
+        self._ramp   = np.linspace(0, 1, FRAME_SAMPLES, endpoint=False,
+                                   dtype=np.float32).reshape(-1, 1)
+        self._gain   = np.empty((FRAME_SAMPLES, 1), dtype=np.float32)
+
+    def process(self, buf):
+        if self.current == self.target:
+            if self.current != 1.0:
+                buf *= self.current
+            return
+        step = self.target - self.current
+        limit = 1.0 / DSP_RAMP_FRAMES
+        step = max(-limit, min(limit, step))
+        np.multiply(self._ramp, step, out=self._gain)
+        self._gain += self.current
+        buf *= self._gain
+        self.current = self.target if abs(self.target - self.current) <= limit \
+            else self.current + step
+
+
+def _biquad(kind, freq, gain_db, q):
+    """RBJ cookbook coefficients as one second-order section."""
+    a  = 10 ** (gain_db / 40)
+    w0 = 2 * math.pi * freq / SAMPLE_RATE
+    cw, sw = math.cos(w0), math.sin(w0)
+    if kind == "lowshelf":
+        alpha = sw / 2 * math.sqrt(2)
+        sa = 2 * math.sqrt(a) * alpha
+        b0 = a * ((a + 1) - (a - 1) * cw + sa)
+        b1 = 2 * a * ((a - 1) - (a + 1) * cw)
+        b2 = a * ((a + 1) - (a - 1) * cw - sa)
+        a0 = (a + 1) + (a - 1) * cw + sa
+        a1 = -2 * ((a - 1) + (a + 1) * cw)
+        a2 = (a + 1) + (a - 1) * cw - sa
+    else:
+        alpha = sw / (2 * q)
+        b0, b1, b2 = 1 + alpha * a, -2 * cw, 1 - alpha * a
+        a0, a1, a2 = 1 + alpha / a, -2 * cw, 1 - alpha / a
+    return [b0 / a0, b1 / a0, b2 / a0, 1.0, a1 / a0, a2 / a0]
+
+
+class Equalizer(DSPStage):
+    """Cascade of biquad bands, ``(kind, freq, gain_db, q)`` each, where kind
+    is ``"lowshelf"`` or ``"peaking"``. Filtering runs in SciPy's ``sosfilt``."""
+    name = "eq"
+
+    def __init__(self, bands):
+        super().__init__()
+        self._sos = None
+        self._zi  = None
+        self.set_bands(bands)
+
+    def set_bands(self, bands):
+        bands = [b for b in bands if b[2]]
+        if not bands:
+            self._sos = self._zi = None
+            return
+        sos = np.array([_biquad(*b) for b in bands], dtype=np.float32)
+        if self._zi is None or self._zi.shape[0] != len(sos):
+            self._zi = np.zeros((len(sos), 2, 2), dtype=np.float32)
+        self._sos = sos
+
+    def process(self, buf):
+        if self._sos is None:
+            return
+        out, self._zi = sosfilt(self._sos, buf, axis=0, zi=self._zi)
+        buf[:] = out
+
+
+class Limiter(DSPStage):
+    """Peak limiter: pulls the gain down as soon as a frame would exceed the
+    ceiling and lets it recover gradually, then hard-clips what's left."""
+    name = "limiter"
+
+    def __init__(self, ceiling=DSP_LIMIT_CEILING, release=DSP_LIMIT_RELEASE):
+        super().__init__()
+        self.ceiling = ceiling
+        self.release = release
+        self.gain    = 1.0
+        self._abs    = np.empty((FRAME_SAMPLES, 2), dtype=np.float32)
+        self._ramp   = np.linspace(0, 1, FRAME_SAMPLES, endpoint=False,
+                                   dtype=np.float32).reshape(-1, 1)
+        self._gain   = np.empty((FRAME_SAMPLES, 1), dtype=np.float32)
+
+    def process(self, buf):
+        np.abs(buf, out=self._abs)
+        peak = float(self._abs.max())
+        target = min(1.0, self.ceiling / peak) if peak > 0 else 1.0
+        if target < self.gain:
+            new = target
+        else:
+            new = self.gain + (target - self.gain) * self.release
+        if new != 1.0 or self.gain != 1.0:
+            np.multiply(self._ramp, new - self.gain, out=self._gain)
+            self._gain += self.gain
+            buf *= self._gain
+        self.gain = new
+        np.clip(buf, -1.0, 1.0, out=buf)
+
+
+class DSPSource(discord.AudioSource):
+    """Runs decoded PCM from ``original`` through a chain of :class:`DSPStage`."""
+
+    def __init__(self, original, stages):
+        self.original = original
+        self.stages   = stages
+        self._buf     = np.empty((FRAME_SAMPLES, 2), dtype=np.float32)
+        self._out     = np.empty((FRAME_SAMPLES, 2), dtype=np.int16)
+
+    @classmethod
+    def build(cls, original, *, volume=0.5, bass_db=0.0):
+        stages = [RampVolume(volume)]
+        if sosfilt is not None:
+            stages.append(Equalizer([("lowshelf", DSP_BASS_FREQ, bass_db, 0.7)]))
+        stages.append(Limiter())
+        return cls(original, stages)
+
+    def stage(self, name):
+        return next((s for s in self.stages if s.name == name), None)
+
+    @property
+    def volume(self):
+        return self.stage("volume").target
+
+    @volume.setter
+    def volume(self, value):
+        self.stage("volume").target = value
+
+    def set_bass(self, bass_db):
+        eq = self.stage("eq")
+        if eq is not None:
+            eq.set_bands([("lowshelf", DSP_BASS_FREQ, bass_db, 0.7)])
+
+    def read(self):
+        data = self.original.read()
+        if not data:
+            return b""
+        pcm = np.frombuffer(data, dtype=np.int16).reshape(-1, 2)
+        buf = self._buf
+        np.multiply(pcm, np.float32(1 / 32768), out=buf)
+        for stage in self.stages:
+            t0 = time.perf_counter_ns()
+            stage.process(buf)
+            stage.cpu_us += ((time.perf_counter_ns() - t0) / 1000 - stage.cpu_us) * 0.05
+        np.multiply(buf, 32767.0, out=self._out, casting="unsafe")
+        return self._out.tobytes()
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        self.original.cleanup()
+
+
+class CrossfadeSource(discord.AudioSource):
+    """Plays ``current`` and blends the next source in over its last
+    ``seconds``, then reports the switch through ``on_handoff(old, new)``."""
+
+    def __init__(self, current, seconds, on_handoff):
+        self.current    = current
+        self.seconds    = seconds
+        self.on_handoff = on_handoff
+        self._next      = None
+        self._lock      = threading.Lock()
+        self._fade_pos  = 0
+        self._fade_len  = 0
+        self._t     = np.arange(FRAME_SAMPLES, dtype=np.float32).reshape(-1, 1)
+        self._theta = np.empty((FRAME_SAMPLES, 1), dtype=np.float32)
+        self._g_out = np.empty((FRAME_SAMPLES, 1), dtype=np.float32)
+        self._g_in  = np.empty((FRAME_SAMPLES, 1), dtype=np.float32)
+        self._a     = np.empty((FRAME_SAMPLES, 2), dtype=np.float32)
+        self._b     = np.empty((FRAME_SAMPLES, 2), dtype=np.float32)
+        self._out   = np.empty((FRAME_SAMPLES, 2), dtype=np.int16)
+
+    @property
+    def has_next(self):
+        return self._next is not None
+
+    def set_next(self, source):
+        with self._lock:
+            old, self._next = self._next, source
+            self._fade_len = 0
+        if old is not None:
+            old.cleanup()
+
+    def drop_next(self):
+        self.set_next(None)
+
+    def replace_current(self, source):
+        with self._lock:
+            old, self.current = self.current, source
+        old.cleanup()
+
+    def _handoff(self):
+        old, self.current, self._next = self.current, self._next, None
+        self._fade_len = 0
+        old.cleanup()
+        self.on_handoff(old, self.current)
+
+    def read(self):
+        with self._lock:
+            cur = self.current.read()
+            nxt = self._next
+            if nxt is None:
+                return cur
+            if not self._fade_len:
+                remaining = self.current.end - self.current.position
+                if self.seconds and self.current.end and remaining <= self.seconds:
+                    self._fade_pos = 0
+                    self._fade_len = max(1, int(remaining / YTDLSource.FRAME_LENGTH))
+                elif cur:
+                    return cur
+                else:
+                    self._handoff()
+                    return self.current.read()
+            inc = nxt.read()
+            if not cur or not inc:
+                self._handoff()
+                return inc or self.current.read()
+            np.add(self._t, self._fade_pos * FRAME_SAMPLES, out=self._theta)
+            self._theta *= math.pi / 2 / (self._fade_len * FRAME_SAMPLES)
+            np.cos(self._theta, out=self._g_out)
+            np.sin(self._theta, out=self._g_in)
+            a = np.frombuffer(cur, dtype=np.int16).reshape(-1, 2)
+            b = np.frombuffer(inc, dtype=np.int16).reshape(-1, 2)
+            np.multiply(a, self._g_out, out=self._a)
+            np.multiply(b, self._g_in, out=self._b)
+            self._a += self._b
+            np.clip(self._a, -32768, 32767, out=self._a)
+            np.copyto(self._out, self._a, casting="unsafe")
+            self._fade_pos += 1
+            if self._fade_pos >= self._fade_len:
+                self._handoff()
+            return self._out.tobytes()
+
+    def is_opus(self):
+        return False
+
+    def cleanup(self):
+        with self._lock:
+            self.current.cleanup()
+            if self._next is not None:
+                self._next.cleanup()
+                self._next = None
+
+
+class BufferedSource(discord.AudioSource):
+    """Read-ahead buffer between FFmpeg and the voice player; returns
+    silence and counts an underrun when it runs dry."""
+
+    def __init__(self, original, seconds=BUFFER_SECONDS):
+        self.original   = original
+        self.capacity   = max(BUFFER_START_FRAMES, int(seconds / YTDLSource.FRAME_LENGTH))
+        self.underruns  = 0
+        self.silent     = 0
+        self._opus      = original.is_opus()
+        self._frames    = deque()
+        self._cond      = threading.Condition()
+        self._ended     = False
+        self._closed    = False
+        self._filling   = True
+        self._thread    = threading.Thread(target=self._fill, daemon=True, name="read-ahead")
+        self._thread.start()
+
+    @property
+    def depth(self):
+        """Buffered audio in seconds."""
+        return len(self._frames) * YTDLSource.FRAME_LENGTH
+
+    def _fill(self):
+        try:
+            while True:
+                data = self.original.read()
+                with self._cond:
+                    if not data:
+                        break
+                    while len(self._frames) >= self.capacity and not self._closed:
+                        self._cond.wait()
+                    if self._closed:
+                        break
+                    self._frames.append(data)
+                    self._cond.notify_all()
+        except Exception as err:
+            logger.warning(f"Read-ahead stopped: {err}")
+        finally:
+            with self._cond:
+                self._ended = True
+                self._cond.notify_all()
+
+    def wait_ready(self, timeout):
+        """Block until the first frame arrives. False if FFmpeg ended
+        without producing any; a slow start counts as alive."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._frames or self._ended, timeout)
+            return bool(self._frames) or not self._ended
+
+    def read(self):
+        with self._cond:
+            if self._filling and not self._ended and len(self._frames) < BUFFER_START_FRAMES:
+                return self._silence()
+            self._filling = False
+            if self._frames:
+                data = self._frames.popleft()
+                self._cond.notify()
+                return data
+            if self._ended:
+                return b""
+            self.underruns += 1
+            self._filling = True
+            return self._silence()
+
+    def _silence(self):
+        self.silent += 1
+        return OPUS_SILENCE if self._opus else b"\0" * discord.opus.Encoder.FRAME_SIZE
+
+    def is_opus(self):
+        return self._opus
+
+    def cleanup(self):
+        with self._cond:
+            self._closed = True
+            self._frames.clear()
+            self._cond.notify_all()
+        self.original.cleanup()
+
+
+class YTDLSource(discord.AudioSource):
+    """A playing track, decoded to PCM or passed to the voice client as Opus."""
 
-FFMPEG_OPTIONS = {
-    "before_options": "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5",
-    "options": "-vn",
-}
+    FRAME_LENGTH = 0.02
+
+    def __init__(self, source, *, track, volume=0.5, offset=0.0, gain=1.0, passthrough=False,
+                 buffer=None, end=0.0, remote=False):
+        self.source    = source
+        self.buffer    = buffer
+        self.remote    = remote
+        self.track     = track
+        self.title     = track.title
+        self.url       = track.url
+        self.duration  = track.duration
+        self.end       = end or track.duration  # where playback stops once silence is cut
+        self.thumbnail = track.thumbnail
+        self.uploader  = track.uploader
+        self.offset    = offset
+        self.gain      = gain
+        self.passthrough = passthrough
+        self.frames    = 0
+        self._volume   = volume
+        self._primed   = None
 
-ytdl = yt_dlp.YoutubeDL(YTDL_OPTIONS)
+    @classmethod
+    def open(cls, track, path, *, volume=0.5, opus=False, codec=None, start=0.0,
+             local=False, bass_db=0.0, levels=None, profile=None, buffer=BUFFER_SECONDS):
+        """``levels`` come from :class:`LevelAnalyser`; ``buffer`` is the
+        read-ahead in seconds (0 disables it)."""
+        gain, length = 1.0, 0.0
+        if levels:
+            gain  = levels["gain"]
+            start = start or levels["lead"]
+            if levels["tail"] and track.duration:
+                length = track.duration - levels["tail"] - start
+        before = "" if local else FFMPEG_OPTIONS["before_options"]
+        if start:
+            before = f"-ss {start:.2f} {before}".strip()
+        if length > 0:
+            before = f"{before} -t {length:.2f}".strip()
+        copy = opus and codec == "opus" and volume == 1.0
+        if copy:
+            # Applying the gain would mean re-encoding; passthrough wins.
+            gain = 1.0
+        buffered = None
 
+        def _buffer(ffmpeg):
+            nonlocal buffered
+            if local or not buffer:
+                return ffmpeg
+            buffered = BufferedSource(ffmpeg, buffer)
+            return buffered
 
-class YTDLSource(discord.PCMVolumeTransformer):
-    def __init__(self, source, *, data, volume=0.5):
-        super().__init__(source, volume)
-        self.data      = data
-        self.title     = data.get("title", "Unknown")
-        self.url       = data.get("webpage_url", "")
-        self.duration  = data.get("duration", 0)
-        self.thumbnail = data.get("thumbnail", "")
-        self.uploader  = data.get("uploader", "Unknown")
+        if not opus and np is not None:
+            source = DSPSource.build(
+                _buffer(discord.FFmpegPCMAudio(path, before_options=before, options="-vn")),
+                volume=volume * gain, bass_db=bass_db)
+        elif not opus:
+            source = discord.PCMVolumeTransformer(
+                _buffer(discord.FFmpegPCMAudio(path, before_options=before, options="-vn")),
+                volume * gain)
+        elif copy:
+            source = _buffer(discord.FFmpegOpusAudio(
+                path, codec="copy", before_options=before, options="-vn"))
+        else:
+            options = f"-vn -filter:a volume={volume * gain:.3f}"
+            kbps = 128
+            if profile:
+                kbps = profile["kbps"]
+                options += f" -compression_level {profile['complexity']}"
+                if profile["fec"]:
+                    options += f" -fec 1 -packet_loss {int(profile['loss'] * 100)}"
+            source = _buffer(discord.FFmpegOpusAudio(
+                path, bitrate=kbps, before_options=before, options=options))
+        return cls(source, track=track, volume=volume, offset=start, gain=gain,
+                   passthrough=copy, buffer=buffered, end=start + length if length > 0 else 0.0,
+                   remote=not local)
 
     @classmethod
-    async def from_url(cls, url, *, loop=None, stream=True):
-        loop = loop or asyncio.get_event_loop()
-        data = await loop.run_in_executor(
-            None, lambda: ytdl.extract_info(url, download=not stream))
-        if "entries" in data:
-            data = data["entries"][0]
-        filename = data["url"] if stream else ytdl.prepare_filename(data)
-        return cls(discord.FFmpegPCMAudio(filename, **FFMPEG_OPTIONS), data=data)
+    async def from_track(cls, track, *, guild_id=None, cache=None, **options):
+        """Open a track from the audio cache if present, else its stream URL."""
+        path = cache.path_for(track.id) if cache else None
+        if path:
+            codec = "opus" if path.endswith((".webm", ".opus")) else None
+            return cls.open(track, path, codec=codec, local=True, **options)
+        if not track.stream_valid:
+            track = await resolve_track(track.url, guild_id=guild_id, requester=track.requester)
+        local = not track.stream_url.startswith(("http://", "https://"))
+        return cls.open(track, track.stream_url, codec=track.codec, local=local, **options)
+
+    def prime(self, timeout=OPEN_CHECK_TIMEOUT):
+        """Wait for the first frame before playback (blocking). False if the
+        stream yields nothing, as a dead or expired stream URL does."""
+        if self.buffer:
+            return self.buffer.wait_ready(timeout)
+        self._primed = self.source.read()
+        return bool(self._primed)
+
+    def read(self):
+        if self._primed is not None:
+            data, self._primed = self._primed, None
+        else:
+            data = self.source.read()
+        if data:
+            self.frames += 1
+        return data
+
+    def is_opus(self):
+        return self.source.is_opus()
+
+    @property
+    def silent_frames(self):
+        return self.buffer.silent if self.buffer else 0
+
+    def cleanup(self):
+        self.source.cleanup()
+
+    @property
+    def dsp(self):
+        return self.source if isinstance(self.source, DSPSource) else None
+
+    def set_bass(self, bass_db):
+        """Retune the bass shelf in place. False if this source has no DSP chain."""
+        if self.dsp is None:
+            return not bass_db
+        self.dsp.set_bass(bass_db)
+        return True
+
+    @property
+    def position(self):
+        """Seconds into the track, counted from frames actually sent."""
+        return self.offset + (self.frames - self.silent_frames) * self.FRAME_LENGTH
+
+    @property
+    def volume(self):
+        return self._volume
+
+    @volume.setter
+    def volume(self, value):
+        # Opus sources bake the volume into FFmpeg's arguments; the manager
+        # reopens them at the current position instead.
+        self._volume = value
+        if not self.is_opus():
+            self.source.volume = value * self.gain
+
+
+class BroadcastStation:
+    """One FFmpeg process shared by every guild tuned in, read into a ring
+    buffer that each subscriber follows from the live edge."""
+
+    def __init__(self, key, track, source, on_idle):
+        self.key      = key
+        self.track    = track
+        self.source   = source
+        self.on_idle  = on_idle
+        self.seq      = 0
+        self.ended    = False
+        self._ring    = [b""] * RADIO_RING_FRAMES
+        self._cond    = threading.Condition()
+        self._subs    = set()
+        self._thread  = threading.Thread(target=self._produce, daemon=True,
+                                         name=f"radio:{key}")
+
+    @property
+    def listeners(self):
+        return len(self._subs)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self.ended = True
+            self._cond.notify_all()
+
+    def subscribe(self):
+        sub = BroadcastSubscriber(self)
+        with self._cond:
+            self._subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._cond:
+            self._subs.discard(sub)
+            idle = not self._subs
+        if idle:
+            self.stop()
+            self.on_idle(self)
+
+    def _produce(self):
+        start, n = time.perf_counter(), 0
+        try:
+            while not self.ended:
+                data = self.source.read()
+                if not data:
+                    break
+                with self._cond:
+                    self._ring[self.seq % RADIO_RING_FRAMES] = data
+                    self.seq += 1
+                    self._cond.notify_all()
+                n += 1
+                delay = start + YTDLSource.FRAME_LENGTH * n - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        except Exception as err:
+            logger.error(f"Radio station {self.key} failed: {err}")
+        finally:
+            self.source.cleanup()
+            self.stop()
+
+    def frame(self, cursor):
+        """Return ``(frame, next_cursor)``; ``frame`` is None if nothing new
+        arrived within one frame time and b"" once the station has ended."""
+        with self._cond:
+            if cursor < self.seq - RADIO_RING_FRAMES + 1:
+                cursor = self.seq - 1
+            if cursor >= self.seq and not self.ended:
+                self._cond.wait(YTDLSource.FRAME_LENGTH * 2)
+            if cursor < self.seq:
+                return self._ring[cursor % RADIO_RING_FRAMES], cursor + 1
+            return (b"" if self.ended else None), cursor
+
+
+class BroadcastSubscriber(discord.AudioSource):
+    def __init__(self, station):
+        self.station = station
+        self.cursor  = station.seq
+        self.frames  = 0
+
+    def read(self):
+        data, self.cursor = self.station.frame(self.cursor)
+        if data is None:
+            return OPUS_SILENCE
+        if data:
+            self.frames += 1
+        return data
+
+    def is_opus(self):
+        return True
+
+    def cleanup(self):
+        if self.station is not None:
+            self.station.unsubscribe(self)
+            self.station = None
+
+
+class QueueView(discord.ui.View):
+    """Page buttons under ``!queue``; rapid clicks collapse into one edit."""
+
+    def __init__(self, cog, state):
+        super().__init__(timeout=QUEUE_VIEW_TIMEOUT)
+        self.cog        = cog
+        self.state      = state
+        self.page       = 0
+        self.message    = None
+        self._last_edit = 0.0
+        self._pending   = False
+
+    @property
+    def pages(self):
+        return max(1, math.ceil(len(self.state.queue) / QUEUE_PAGE_SIZE))
+
+    async def _turn(self, interaction, page):
+        self.page = max(0, min(page, self.pages - 1))
+        await interaction.response.defer()
+        if self._pending:
+            return
+        self._pending = True
+        try:
+            await asyncio.sleep(max(0.0, self._last_edit + QUEUE_EDIT_INTERVAL - time.monotonic()))
+            await self.message.edit(embed=self.cog._queue_embed(self.state, self.page), view=self)
+            self._last_edit = time.monotonic()
+        finally:
+            self._pending = False
+
+    @discord.ui.button(emoji="⏮️", style=discord.ButtonStyle.secondary)
+    async def first(self, interaction, button):
+        await self._turn(interaction, 0)
+
+    @discord.ui.button(emoji="◀️", style=discord.ButtonStyle.secondary)
+    async def prev(self, interaction, button):
+        await self._turn(interaction, self.page - 1)
+
+    @discord.ui.button(emoji="▶️", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction, button):
+        await self._turn(interaction, self.page + 1)
+
+    @discord.ui.button(emoji="⏭️", style=discord.ButtonStyle.secondary)
+    async def last(self, interaction, button):
+        await self._turn(interaction, self.pages - 1)
+
+    async def on_timeout(self):
+        for item in self.children:
+            item.disabled = True
+        if self.message:
+            try:
+                await self.message.edit(view=self)
+            except discord.HTTPException:
+                pass
+
+
+class SearchView(discord.ui.View):
+    """Select menu under ``!search``. Only the person who searched can
+    pick, and only the picked entry is resolved."""
+
+    def __init__(self, cog, ctx, tracks):
+        super().__init__(timeout=SEARCH_VIEW_TIMEOUT)
+        self.cog     = cog
+        self.ctx     = ctx
+        self.tracks  = tracks
+        self.message = None
+        self.select  = discord.ui.Select(placeholder=t("search_pick"), options=[
+            discord.SelectOption(label=tr.title[:100], value=str(i),
+                                 description=f"{fmt_duration(tr.duration)} • {tr.uploader}"[:100])
+            for i, tr in enumerate(tracks)])
+        self.select.callback = self._picked
+        self.add_item(self.select)
+
+    async def interaction_check(self, interaction):
+        return interaction.user.id == self.ctx.author.id
+
+    async def _picked(self, interaction):
+        track = self.tracks[int(self.select.values[0])]
+        self.stop()
+        await interaction.response.edit_message(embed=self.cog._e(
+            t("search_title"), t("search_chosen", title=track.title), 0x23a55a), view=None)
+        if not await self.cog._ensure_voice(self.ctx):
+            return
+        try:
+            await self.cog._queue_url(self.ctx, self.cog.get_state(self.ctx.guild.id), track.url)
+        except Exception as err:
+            await self.ctx.send(embed=self.cog._err(str(err)))
+
+    async def on_timeout(self):
+        if self.message:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
 
 
 class GuildMusicState:
-    def __init__(self):
-        self.queue        = deque()
+    def __init__(self, guild_id, queue_max=QUEUE_MAX, queue_user_max=QUEUE_USER_MAX):
+        self.guild_id     = guild_id
+        self.queue        = TrackQueue(queue_max, queue_user_max)
         self.current      = None
         self.voice_client = None
         self.volume       = 0.5
         self.loop         = False
+        self.bass_db      = 0.0
+        self.prefetched   = None
+        self.prefetch_task = None
+        self.crossfade    = 0
+        self.mixer        = None
+        self.encoder_profile = None
+        self.radio        = None
+        self.commands     = asyncio.Queue()
+        self.actor        = None
+        self.generation   = 0
+        self.ctx          = None
+        self.watch_track  = None
+        self.watch_source = None
+        self.watch_frames = -1
+        self.watch_since  = 0.0
+        self.stall_level  = 0
+        self.auto_paused  = False
+        self.reconnecting = False
+        self.idle_since   = None
+        self.last_active  = time.monotonic()
+        self.np_message   = None
+        self.np_task      = None
+        self.np_dirty     = False
+        self.np_edited_at = 0.0
+        self.history      = deque(maxlen=HISTORY_SIZE)
+        self.autoplay     = False
+
+    def drop_prefetch(self):
+        """Cancel a pending prefetch and close any source it already opened."""
+        if self.prefetch_task:
+            self.prefetch_task.cancel()
+            self.prefetch_task = None
+        if self.prefetched:
+            self.prefetched.cleanup()
+            self.prefetched = None
+        if self.mixer:
+            self.mixer.drop_next()
+
+    def remember(self):
+        """Push the current track onto the history; returns whether it was added."""
+        if self.current is not None and (not self.history
+                                         or self.history[-1] is not self.current.track):
+            self.history.append(self.current.track)
+            return True
+        return False
+
+    def take_prefetch(self, track):
+        """Return the prefetched source if it was opened for ``track``."""
+        source, self.prefetched = self.prefetched, None
+        if source is not None and source.track is not track:
+            source.cleanup()
+            source = None
+        if self.prefetch_task:
+            self.prefetch_task.cancel()
+            self.prefetch_task = None
+        return source
 
     def is_playing(self):
         return self.voice_client and self.voice_client.is_playing()
@@ -65,11 +2176,61 @@ class MusicManager(commands.Cog, name="Music"):
     def __init__(self, bot):
         self.bot    = bot
         self._states = {}
+        self._stations = {}
+        cfg = getattr(bot, "config", {})
+        cache_mb = int(cfg.get("audio_cache_mb", 0) or 0)
+        self.audio_cache = AudioCache(cfg.get("audio_cache_dir") or "audio_cache",
+                                      cache_mb * 1024 * 1024) if cache_mb > 0 else None
+        self.opus_mode = bool(cfg.get("opus_passthrough", False))
+        self.data_dir  = cfg.get("music_data_dir") or "music_data"
+        self.buffer_seconds = float(cfg.get("stream_buffer", BUFFER_SECONDS))
+        self.idle_timeout   = float(cfg.get("idle_timeout", IDLE_TIMEOUT))
+        self.queue_max      = int(cfg.get("queue_max", QUEUE_MAX))
+        self.queue_user_max = int(cfg.get("queue_user_max", QUEUE_USER_MAX))
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.analyser  = LevelAnalyser(os.path.join(self.data_dir, "levels.json"))
+        self.recoveries = {"restart": 0, "reconnect": 0, "skip": 0}
+        library_dir = cfg.get("library_dir")
+        self.library = LocalLibrary(library_dir, os.path.join(self.data_dir, "library.json")) \
+            if library_dir else None
+        self.playlists = PlaylistStore(os.path.join(self.data_dir, "playlists.json"))
+        self.autoplay  = AutoplayModel(os.path.join(self.data_dir, "autoplay")) \
+            if sparse is not None and np is not None else None
+
+    async def cog_load(self):
+        extraction_engine.start()
+        self._retune_loop.start()
+        self._watchdog.start()
+        self._reaper.start()
+        self._np_ticker.start()
+        if self.library:
+            self.bot.loop.create_task(self.library.scan())
+
+    async def cog_unload(self):
+        self._retune_loop.cancel()
+        self._watchdog.cancel()
+        self._reaper.cancel()
+        self._np_ticker.cancel()
+        extraction_engine.shutdown()
+        download_engine.shutdown()
+        if self.audio_cache:
+            self.audio_cache.save()
+        self.analyser.close()
+        if self.autoplay:
+            self.autoplay.save()
+        for station in list(self._stations.values()):
+            station.stop()
+        for state in self._states.values():
+            if state.actor:
+                state.actor.cancel()
 
     def get_state(self, guild_id):
         if guild_id not in self._states:
-            self._states[guild_id] = GuildMusicState()
-        return self._states[guild_id]
+            self._states[guild_id] = GuildMusicState(
+                guild_id, self.queue_max, self.queue_user_max)
+        state = self._states[guild_id]
+        state.last_active = time.monotonic()
+        return state
 
     def _e(self, title, description=None, color=0x5865F2):
         em = discord.Embed(title=title, description=description, color=color)
@@ -86,39 +2247,604 @@ class MusicManager(commands.Cog, name="Music"):
         state = self.get_state(ctx.guild.id)
         if not state.voice_client or not state.voice_client.is_connected():
             state.voice_client = await ctx.author.voice.channel.connect()
+            await self._tune_encoder(state)
         elif ctx.author.voice.channel != state.voice_client.channel:
             await state.voice_client.move_to(ctx.author.voice.channel)
+            await self._tune_encoder(state)
         return True
 
-    async def _play_next(self, ctx):
-        state = self.get_state(ctx.guild.id)
-        if state.loop and state.current:
+    async def _tune_encoder(self, state):
+        """Match encoder settings to the channel bitrate and link quality,
+        re-tuning the running stream when they change."""
+        vc = state.voice_client
+        if not vc or not vc.is_connected():
+            return
+        old = state.encoder_profile
+        profile = encoder_profile(getattr(vc.channel, "bitrate", 0),
+                                  _link_loss(vc, old["loss"] if old else None))
+        if profile == old:
+            return
+        state.encoder_profile = profile
+        if state.current is None:
+            return
+        if not state.current.is_opus():
+            if isinstance(vc.encoder, discord.opus.Encoder):
+                apply_encoder_profile(vc.encoder, profile)
+        elif not state.current.passthrough and (old is None or any(
+                old[k] != profile[k] for k in ("kbps", "complexity", "bandwidth"))):
+            # FEC changes alone wait for the next track rather than
+            # restarting FFmpeg mid-song.
+            self._post(state, "reopen", state.ctx)
+
+    @tasks.loop(seconds=ENCODER_RETUNE_INTERVAL)
+    async def _retune_loop(self):
+        for state in list(self._states.values()):
+            if state.is_playing():
+                try:
+                    await self._tune_encoder(state)
+                except Exception as err:
+                    logger.warning(f"Encoder re-tune failed in guild {state.guild_id}: {err}")
+
+    @commands.Cog.listener()
+    async def on_guild_channel_update(self, before, after):
+        state = self._states.get(after.guild.id)
+        if state and state.voice_client and state.voice_client.channel == after \
+                and getattr(before, "bitrate", None) != getattr(after, "bitrate", None):
+            await self._tune_encoder(state)
+
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member, before, after):
+        """Pause while nobody but bots is listening; resume when someone
+        comes back."""
+        state = self._states.get(member.guild.id)
+        if state is None or state.voice_client is None:
+            return
+        vc = state.voice_client
+        if member.id == self.bot.user.id:
+            if after.channel is not None:
+                state.reconnecting = False
+            elif before.channel and not state.reconnecting:
+                # Kicked or disconnected from outside: drop the dead client.
+                self._post(state, "stop", state.ctx, False)
+            return
+        if vc.channel not in (before.channel, after.channel):
+            return
+        alone = not any(not m.bot for m in vc.channel.members)
+        if alone and vc.is_playing():
+            vc.pause()
+            state.auto_paused = True
+        elif not alone and state.auto_paused:
+            state.auto_paused = False
+            if vc.is_paused():
+                vc.resume()
+
+    @tasks.loop(seconds=REAPER_INTERVAL)
+    async def _reaper(self):
+        """Disconnect guilds idle for ``idle_timeout`` seconds and forget
+        states nobody has touched for ``STATE_TTL``."""
+        now = time.monotonic()
+        if self.autoplay:
             try:
-                source = await YTDLSource.from_url(state.current.url, loop=self.bot.loop)
-                state.voice_client.play(source, after=lambda e: asyncio.run_coroutine_threadsafe(
-                    self._play_next(ctx), self.bot.loop))
-                state.current = source
+                self.autoplay.save()
             except Exception as err:
-                logger.error(err)
-        elif state.queue:
-            url = state.queue.popleft()
+                logger.warning(f"Autoplay model save failed: {err}")
+        for guild_id, state in list(self._states.items()):
+            vc = state.voice_client
+            if vc and vc.is_connected():
+                if vc.is_playing():
+                    state.idle_since = None
+                elif state.idle_since is None:
+                    state.idle_since = now
+                elif self.idle_timeout and now - state.idle_since >= self.idle_timeout:
+                    state.idle_since = None
+                    self._post(state, "stop", state.ctx, False)
+                    if state.ctx:
+                        try:
+                            await state.ctx.send(embed=self._e(
+                                t("disconnected"), t("idle_left", m=int(self.idle_timeout // 60)),
+                                0xf0b232))
+                        except discord.HTTPException as err:
+                            logger.warning(f"Idle notice failed in guild {guild_id}: {err}")
+                continue
+            if now - state.last_active >= STATE_TTL and state.commands.empty() \
+                    and not state.queue:
+                for task in (state.actor, state.np_task):
+                    if task:
+                        task.cancel()
+                del self._states[guild_id]
+
+    async def _source_for(self, state, track, *, start=0.0, opus=None):
+        return await YTDLSource.from_track(
+            track, guild_id=state.guild_id, cache=self.audio_cache, volume=state.volume,
+            opus=self._uses_opus(state) if opus is None else opus, start=start,
+            bass_db=state.bass_db, levels=self.analyser.get(track.id),
+            profile=state.encoder_profile, buffer=self.buffer_seconds)
+
+    def _uses_opus(self, state):
+        # The DSP chain and the crossfade mixer need decoded PCM.
+        return self.opus_mode and not state.bass_db and not state.crossfade
+
+    def _np_embed(self, source, state):
+        title = f"[{source.title}]({source.url})" if source.url.startswith("http") else source.title
+        em = self._e(t("now_playing"), f"**{title}**")
+        em.add_field(name=t("progress_lbl"),
+                     value=progress_bar(source.position, source.end), inline=False)
+        em.add_field(name=t("uploader"),  value=source.uploader)
+        em.add_field(name=t("volume_lbl"), value=f"`{int(state.volume * 100)}%`")
+        em.add_field(name=t("loop_lbl"),
+                     value=t("loop_on") if state.loop else t("loop_off"))
+        if state.queue:
+            em.add_field(name=t("up_next_lbl"), value=f"`{state.queue[0].title}`", inline=False)
+        if source.thumbnail:
+            em.set_thumbnail(url=source.thumbnail)
+        return em
+
+    def _announce(self, ctx, state):
+        """Mark the guild's now-playing message stale. Calls that arrive
+        while an update is pending are folded into it."""
+        state.np_dirty = True
+        if state.np_task is None or state.np_task.done():
+            state.np_task = self.bot.loop.create_task(self._np_update(ctx, state))
+
+    async def _np_update(self, ctx, state):
+        """Edit the live now-playing message in place, at most once per
+        ``NP_EDIT_INTERVAL``; send a new one if it is gone."""
+        while state.np_dirty:
+            await asyncio.sleep(max(NP_DEBOUNCE,
+                                    state.np_edited_at + NP_EDIT_INTERVAL - time.monotonic()))
+            state.np_dirty = False
+            if state.current is None:
+                return
+            em = self._np_embed(state.current, state)
+            try:
+                if state.np_message is None:
+                    state.np_message = await ctx.send(embed=em)
+                else:
+                    try:
+                        await state.np_message.edit(embed=em)
+                    except (discord.NotFound, discord.Forbidden):
+                        state.np_message = await ctx.send(embed=em)
+            except discord.HTTPException as err:
+                logger.warning(f"Now-playing update failed: {err}")
+            state.np_edited_at = time.monotonic()
+
+    @tasks.loop(seconds=NP_PROGRESS_INTERVAL)
+    async def _np_ticker(self):
+        for state in list(self._states.values()):
+            if state.np_message and state.current and state.is_playing():
+                self._announce(state.ctx, state)
+
+    async def _open(self, state, track, start=0.0):
+        source = state.take_prefetch(track) if not start else None
+        if source is not None and (source.is_opus() != self._uses_opus(state)
+                                   or source.is_opus() and source.volume != state.volume):
+            source.cleanup()
+            source = None
+        if source is None:
+            source = await self._source_for(state, track, start=start)
+        if source.remote and not await asyncio.to_thread(source.prime):
+            source.cleanup()
+            raise ExtractionError(f"No audio from the stream of {track.title}")
+        source.volume = state.volume
+        source.set_bass(state.bass_db)
+        return source
+
+    async def _reopen(self, state, opus=None):
+        """Swap the playing source for a fresh one at the same position,
+        without stopping the voice player or firing its after-callback."""
+        old = state.current
+        if old is None or not (state.is_playing() or state.is_paused()):
+            return
+        opus = old.is_opus() if opus is None else opus
+        new = await self._source_for(state, old.track, start=old.position, opus=opus)
+        if state.current is not old or not (state.is_playing() or state.is_paused()):
+            new.cleanup()
+            return
+        if not opus and not isinstance(state.voice_client.encoder, discord.opus.Encoder):
+            # The player only creates an encoder when it starts on a PCM source.
+            state.voice_client.encoder = discord.opus.Encoder()
+            if state.encoder_profile:
+                apply_encoder_profile(state.voice_client.encoder, state.encoder_profile)
+        if state.mixer and not opus:
+            state.mixer.replace_current(new)
+            state.current = new
+            return
+        state.voice_client.source = new
+        state.current = new
+        old.cleanup()
+
+    def _start(self, ctx, state, source):
+        state.current    = source
+        state.mixer      = None
+        if state.crossfade and not source.is_opus():
+            state.mixer = CrossfadeSource(
+                source, state.crossfade, lambda old, new: self.bot.loop.call_soon_threadsafe(
+                    self._on_crossfade, ctx, state, new))
+        state.voice_client.play(state.mixer or source, after=self._on_end(ctx, state))
+        if not source.is_opus() and state.encoder_profile:
+            apply_encoder_profile(state.voice_client.encoder, state.encoder_profile)
+        self._schedule_prefetch(state)
+        self._maybe_cache(state)
+        self._analyse_soon(state)
+
+    def _analyse_soon(self, state):
+        """Queue loudness/silence analysis for the playing and next track."""
+        for track in (state.current.track, state.queue[0] if state.queue else None):
+            if track is not None:
+                self.analyser.submit(track, self.audio_cache.peek(track.id) if self.audio_cache else None)
+
+    def _on_crossfade(self, ctx, state, new):
+        """The mixer has moved on to ``new``; catch the guild state up."""
+        if state.mixer is None or state.mixer.current is not new:
+            return
+        if not state.loop and state.queue and state.queue[0] is new.track:
+            state.queue.popleft()
+        if not state.loop:
+            self._remember(state)
+        state.current    = new
+        self._schedule_prefetch(state)
+        self._maybe_cache(state)
+        self._analyse_soon(state)
+        self._announce(ctx, state)
+
+    def _maybe_cache(self, state):
+        if self.audio_cache and state.current \
+                and self.audio_cache.is_hot(state.current.track, state.loop):
+            self.bot.loop.create_task(self.audio_cache.store(state.current.track, state.guild_id))
+
+    def _schedule_prefetch(self, state):
+        if state.current is None or state.prefetched is not None:
+            return
+        if state.mixer and state.mixer.has_next:
+            return
+        if state.prefetch_task and not state.prefetch_task.done():
+            return
+        state.prefetch_task = self.bot.loop.create_task(self._prefetch(state, state.current))
+
+    async def _prefetch(self, state, playing):
+        """Open the next track's source shortly before ``playing`` ends, so
+        the after-callback can start it without extraction or FFmpeg startup."""
+        try:
+            if playing.end:
+                await asyncio.sleep(max(0, playing.end - PREFETCH_LEAD - playing.position))
+            if state.current is not playing:
+                return
+            if state.loop:
+                track = playing.track
+            else:
+                self._autoplay_fill(state)
+                if not state.queue:
+                    return
+                track = state.queue[0]
+            if not playing.duration:
+                # Unknown length (live streams): refresh the stream URL but
+                # don't hold an FFmpeg process open indefinitely.
+                if not track.stream_valid:
+                    fresh = await resolve_track(track.url, guild_id=state.guild_id)
+                    track.stream_url, track.expires_at = fresh.stream_url, fresh.expires_at
+                return
+            source = await self._source_for(state, track)
+            if source.track is not track:
+                track.stream_url = source.track.stream_url
+                track.expires_at = source.track.expires_at
+                source.track = track
+            if state.current is playing and state.mixer and not source.is_opus():
+                state.mixer.set_next(source)
+            elif state.current is playing and state.prefetched is None:
+                state.prefetched = source
+            else:
+                source.cleanup()
+        except asyncio.CancelledError:
+            raise
+        except Exception as err:
+            logger.warning(f"Prefetch failed: {err}")
+
+    def _on_end(self, ctx, state):
+        """After-callback for a new playback. Stale callbacks (from sources
+        replaced by skip or stop) are ignored by the actor."""
+        state.generation += 1
+        state.ctx = ctx
+        gen = state.generation
+        return lambda e: self.bot.loop.call_soon_threadsafe(self._post, state, "ended", ctx, gen)
+
+    def _post(self, state, op, ctx, arg=None, fut=None):
+        if state.actor is None or state.actor.done():
+            state.actor = self.bot.loop.create_task(self._actor(state))
+        state.commands.put_nowait((op, ctx, arg, fut))
+
+    async def _submit(self, state, op, ctx, arg=None):
+        """Hand a command to the guild's actor and wait for its result."""
+        fut = self.bot.loop.create_future()
+        self._post(state, op, ctx, arg, fut)
+        return await fut
+
+    async def _actor(self, state):
+        """Apply playback commands for one guild strictly one at a time, so
+        enqueue, skip, stop and track-ended never interleave."""
+        while True:
+            op, ctx, arg, fut = await state.commands.get()
             try:
-                source = await YTDLSource.from_url(url, loop=self.bot.loop)
-                state.current = source
-                state.voice_client.play(source, after=lambda e: asyncio.run_coroutine_threadsafe(
-                    self._play_next(ctx), self.bot.loop))
-                dur = f"{source.duration // 60}:{source.duration % 60:02d}"
-                em = self._e(t("now_playing"), f"**[{source.title}]({source.url})**")
-                em.add_field(name=t("duration"), value=f"`{dur}`")
-                em.add_field(name=t("uploader"),  value=source.uploader)
-                if source.thumbnail:
-                    em.set_thumbnail(url=source.thumbnail)
-                await ctx.send(embed=em)
+                result = await getattr(self, f"_do_{op}")(ctx, state, arg)
             except Exception as err:
-                await ctx.send(embed=self._err(str(err)))
-                await self._play_next(ctx)
+                logger.error(f"Playback command {op} failed: {err}")
+                if fut and not fut.done():
+                    fut.set_exception(err)
+            else:
+                if fut and not fut.done():
+                    fut.set_result(result)
+
+    async def _do_enqueue(self, ctx, state, tracks):
+        """Queue every accepted track of ``tracks``; returns how many were."""
+        head = state.queue[0] if state.queue else None
+        added = state.queue.extend(tracks)
+        await self._settle(ctx, state, head)
+        return added
+
+    async def _do_enqueue_one(self, ctx, state, track):
+        """Queue ``track``, raising :class:`QueueError` if it is refused.
+        Returns its position, or 0 if it started playing right away."""
+        head = state.queue[0] if state.queue else None
+        position = state.queue.push(track)
+        return position if await self._settle(ctx, state, head) else 0
+
+    async def _do_enqueue_next(self, ctx, state, track):
+        head = state.queue[0] if state.queue else None
+        position = state.queue.push_next(track)
+        return position if await self._settle(ctx, state, head) else 0
+
+    async def _settle(self, ctx, state, head):
+        """After queueing: refresh the prefetch, or start playback if idle.
+        Returns whether something was already playing."""
+        if state.is_playing() or state.is_paused():
+            self._head_changed(state, head)
+            return True
+        await self._advance(ctx, state)
+        return False
+
+    def _head_changed(self, state, head):
+        """Discard a source prefetched for ``head`` once the queue no longer
+        starts with it."""
+        if state.loop or (state.queue[0] if state.queue else None) is head:
+            self._schedule_prefetch(state)
+            return
+        state.drop_prefetch()
+        self._schedule_prefetch(state)
+
+    async def _do_ended(self, ctx, state, gen):
+        if gen == state.generation:
+            await self._advance(ctx, state)
+
+    async def _do_skip(self, ctx, state, _):
+        if not (state.is_playing() or state.is_paused()):
+            return False
+        state.generation += 1
+        state.voice_client.stop()
+        await self._advance(ctx, state)
+        return True
+
+    async def _do_stop(self, ctx, state, clear):
+        if clear:
+            state.queue.clear()
+            state.loop = False
+        state.generation += 1
+        state.drop_prefetch()
+        self._remember(state)
+        state.current = state.radio = None
+        state.auto_paused = False
+        state.np_message = None
+        vc, state.voice_client = state.voice_client, None
+        if vc:
+            vc.stop()
+            await vc.disconnect()
+
+    async def _do_reopen(self, ctx, state, opus):
+        await self._reopen(state, opus)
+
+    async def _do_radio(self, ctx, state, sub):
+        state.drop_prefetch()
+        vc = state.voice_client
+        if state.is_playing() or state.is_paused():
+            # Swap in place so the queue resumes once the broadcast ends.
+            old, vc.source = vc.source, sub
+            old.cleanup()
+            vc.resume()
+        else:
+            vc.play(sub, after=self._on_end(ctx, state))
+        state.current, state.mixer, state.radio = None, None, sub
+
+    async def _do_recover(self, ctx, state, level):
+        """Escalating recovery for a stalled guild: restart the source where
+        it stopped, then rebuild the voice connection, then skip."""
+        if not state.is_playing():
+            return
+        if level == 1 and state.current is None:
+            level = 2  # a radio subscription can't be restarted on its own
+        step = ("restart", "reconnect", "skip")[min(level, 3) - 1]
+        self.recoveries[step] += 1
+        logger.warning(f"Playback stalled in guild {state.guild_id}: {step} "
+                       f"(#{self.recoveries[step]} {step}s so far)")
+        if step == "restart":
+            await self._reopen(state)
+        elif step == "reconnect":
+            vc, current = state.voice_client, state.current
+            channel = vc.channel
+            state.generation += 1
+            state.drop_prefetch()
+            # Our own leave event must not read as a kick; the rejoin
+            # event clears the flag.
+            state.reconnecting = True
+            await vc.disconnect(force=True)
+            try:
+                state.voice_client = await channel.connect()
+            except Exception:
+                state.reconnecting = False
+                await self._do_stop(ctx, state, False)
+                raise
+            await self._tune_encoder(state)
+            if current is None:
+                await self._advance(ctx, state)
+            else:
+                self._start(ctx, state, await self._source_for(
+                    state, current.track, start=current.position))
+        else:
+            await self._do_skip(ctx, state, None)
+
+    @tasks.loop(seconds=WATCHDOG_INTERVAL)
+    async def _watchdog(self):
+        """Post escalating recovery commands for guilds that are "playing" but
+        have delivered no frame for ``WATCHDOG_STALL`` seconds."""
+        now = time.monotonic()
+        for state in list(self._states.values()):
+            if not state.is_playing():
+                # Paused, or between sources while a recovery is in flight:
+                # restart the clock but keep the level for the same track.
+                if state.current is None and state.radio is None:
+                    state.watch_track = None
+                state.watch_since = now
+                continue
+            source = state.current or state.radio
+            track  = state.current.track if state.current else state.radio
+            frames = source.frames - getattr(source, "silent_frames", 0)
+            if track is not state.watch_track:
+                state.watch_track, state.stall_level = track, 0
+            elif source is not state.watch_source:
+                pass  # restarted by a recovery: new baseline, same level
+            elif frames != state.watch_frames:
+                state.stall_level = 0
+            elif now - state.watch_since >= WATCHDOG_STALL:
+                state.stall_level += 1
+                state.watch_since = now
+                self._post(state, "recover", state.ctx, state.stall_level)
+                continue
+            else:
+                continue
+            state.watch_source = source
+            state.watch_frames, state.watch_since = frames, now
+
+    async def _do_previous(self, ctx, state, _):
+        """Play the most recent history entry now; the interrupted track
+        goes back to the front of the queue."""
+        if not state.history:
+            return None
+        track = state.history.pop()
+        if state.current is not None and state.current.track is not track:
+            try:
+                state.queue.push_next(state.current.track)
+            except QueueError:
+                pass
+        return await self._play_now(ctx, state, track)
+
+    async def _do_replay(self, ctx, state, _):
+        """Restart the current track, or the last finished one if idle."""
+        if state.current is not None:
+            track = state.current.track
+        elif state.history:
+            track = state.history[-1]
         else:
-            state.current = None
+            return None
+        return await self._play_now(ctx, state, track)
+
+    async def _play_now(self, ctx, state, track):
+        source = await self._open_retrying(state, track)
+        state.generation += 1
+        if state.is_playing() or state.is_paused():
+            state.voice_client.stop()
+        state.radio = None
+        self._start(ctx, state, source)
+        self._announce(ctx, state)
+        return track
+
+    def _remember(self, state):
+        if state.remember() and self.autoplay:
+            self.autoplay.observe(state.history)
+
+    def _autoplay_fill(self, state):
+        """Queue the model's next pick when autoplay is on and the queue is empty."""
+        if state.queue or not state.autoplay or self.autoplay is None:
+            return
+        seeds = list(state.history)
+        if state.current is not None and (not seeds or seeds[-1] is not state.current.track):
+            seeds.append(state.current.track)
+        if not seeds:
+            return
+        record = self.autoplay.suggest(reversed(seeds), {TrackQueue._key(tr) for tr in seeds})
+        track  = self._from_record(record, None) if record else None
+        if track is not None:
+            try:
+                state.queue.push(track)
+            except QueueError:
+                pass
+
+    async def _advance(self, ctx, state):
+        """Start the next playable track, walking past broken entries."""
+        state.radio = None
+        if not state.loop:
+            self._remember(state)
+        failures = 0
+        while state.voice_client and state.voice_client.is_connected():
+            looping = state.loop and state.current is not None
+            if not looping:
+                self._autoplay_fill(state)
+            if looping:
+                track = state.current.track
+            elif state.queue:
+                track = state.queue.popleft()
+            else:
+                break
+            try:
+                source = await self._open_retrying(state, track)
+            except Exception as err:
+                # A track that won't open can't be looped either.
+                state.current = None
+                await ctx.send(embed=self._err(str(err)))
+                failures += 1
+                if failures >= ADVANCE_MAX_FAILURES:
+                    break
+                continue
+            self._start(ctx, state, source)
+            if not looping:
+                self._announce(ctx, state)
+            return
+        state.current = None
+
+    async def _open_retrying(self, state, track):
+        """Open ``track``, re-resolving its stream once if the old URL fails."""
+        for attempt in range(ADVANCE_RETRIES):
+            try:
+                return await self._open(state, track)
+            except Exception as err:
+                if _is_unavailable(err) or attempt == ADVANCE_RETRIES - 1:
+                    raise
+                logger.warning(f"Retrying {track.url}: {err}")
+                resolve_cache.invalidate(cache_key(track.url))
+                track.expires_at = 0.0
+
+    async def _enqueue_playlist(self, ctx, state, url):
+        """Expand a playlist with flat extraction: the first page starts
+        playback, then one pass fetches the rest (each yt-dlp call walks
+        the playlist from the top, so paging further would be quadratic)."""
+        page = await extraction_engine.submit(
+            ctx.guild.id, _worker_extract_flat, url, 1, PLAYLIST_PAGE_SIZE)
+        title = page["title"] or url
+        total = added = await self._submit(
+            state, "enqueue", ctx, [Track.from_flat(entry, ctx.author.id) for entry in page["entries"]])
+        room = state.queue.room(ctx.author.id)
+        if page["fetched"] < PLAYLIST_PAGE_SIZE or not added or room == 0:
+            await ctx.send(embed=self._e(t("playlist_added"), t(
+                "playlist_added_msg", title=title, n=total), 0x23a55a))
+            return
+        msg = await ctx.send(embed=self._e(
+            t("playlist_loading"), t("playlist_progress", n=total), 0xf0b232))
+        start = PLAYLIST_PAGE_SIZE + 1
+        try:
+            rest = await extraction_engine.submit(
+                ctx.guild.id, _worker_extract_flat, url, start,
+                start + room - 1 if room is not None else None, timeout=PLAYLIST_TIMEOUT)
+            total += await self._submit(
+                state, "enqueue", ctx, [Track.from_flat(entry, ctx.author.id) for entry in rest["entries"]])
+        finally:
+            await msg.edit(embed=self._e(t("playlist_added"), t(
+                "playlist_added_msg", title=title, n=total), 0x23a55a))
 
     @commands.command(name="play", aliases=["p"])
     async def play(self, ctx, *, query: str):
@@ -127,31 +2853,170 @@ class MusicManager(commands.Cog, name="Music"):
         state = self.get_state(ctx.guild.id)
         async with ctx.typing():
             try:
+                if query.startswith("http") and is_playlist_url(query):
+                    await self._enqueue_playlist(ctx, state, query)
+                    return
+                if query.startswith("local:"):
+                    await self._queue_local(ctx, state, query[len("local:"):])
+                    return
                 url = query if query.startswith("http") else f"ytsearch:{query}"
-                if state.is_playing() or state.is_paused():
-                    state.queue.append(url)
-                    data = await asyncio.get_event_loop().run_in_executor(
-                        None, lambda: ytdl.extract_info(url, download=False))
-                    if "entries" in data:
-                        data = data["entries"][0]
-                    em = self._e(t("added_queue"), f"**{data.get('title','?')}**", 0x23a55a)
-                    em.add_field(name=t("position"), value=f"`#{len(state.queue)}`")
-                    await ctx.send(embed=em)
-                else:
-                    source = await YTDLSource.from_url(url, loop=self.bot.loop)
-                    state.current = source
-                    source.volume = state.volume
-                    state.voice_client.play(source, after=lambda e: asyncio.run_coroutine_threadsafe(
-                        self._play_next(ctx), self.bot.loop))
-                    dur = f"{source.duration // 60}:{source.duration % 60:02d}"
-                    em = self._e(t("now_playing"), f"**[{source.title}]({source.url})**")
-                    em.add_field(name=t("duration"), value=f"`{dur}`")
-                    em.add_field(name=t("uploader"),  value=source.uploader)
-                    if source.thumbnail:
-                        em.set_thumbnail(url=source.thumbnail)
-                    await ctx.send(embed=em)
+                await self._queue_url(ctx, state, url)
+            except Exception as err:
+                await ctx.send(embed=self._err(str(err)))
+
+    async def _queue_url(self, ctx, state, url, *, front=False):
+        """Resolve ``url`` and queue it."""
+        track = await resolve_track(url, guild_id=ctx.guild.id, requester=ctx.author.id)
+        await self._queue_track(ctx, state, track, front=front)
+
+    async def _queue_local(self, ctx, state, query, *, front=False):
+        if self.library is None:
+            await ctx.send(embed=self._err(t("err_no_library")))
+            return
+        hits = self.library.search(query)
+        if not hits:
+            await ctx.send(embed=self._err(t("err_no_results")))
+            return
+        await self._queue_track(ctx, state, self.library.track(hits[0], ctx.author.id), front=front)
+
+    async def _queue_track(self, ctx, state, track, *, front=False):
+        """Queue ``track``, replying with its queue position unless it
+        started playing straight away."""
+        if front:
+            position = await self._submit(state, "enqueue_next", ctx, track)
+        else:
+            position = await self._submit(state, "enqueue_one", ctx, track)
+        if position:
+            em = self._e(t("added_queue"), f"**{track.title}**", 0x23a55a)
+            em.add_field(name=t("position"), value=f"`#{position}`")
+            await ctx.send(embed=em)
+
+    @commands.command(name="library", aliases=["lib"])
+    async def library_cmd(self, ctx, action: str = None):
+        if self.library is None:
+            await ctx.send(embed=self._err(t("err_no_library")))
+            return
+        if action == "rescan":
+            async with ctx.typing():
+                probed, removed = await self.library.scan()
+            msg = t("library_rescanned", n=len(self.library), probed=probed, removed=removed)
+        else:
+            msg = t("library_info", n=len(self.library))
+        await ctx.send(embed=self._e(t("library_title"), msg))
+
+    def _from_record(self, record, requester):
+        url = record["url"]
+        if url.startswith("local:"):
+            rel = url[len("local:"):]
+            return self.library.track(rel, requester) if self.library and rel in self.library else None
+        return Track.from_record(record, requester)
+
+    @commands.command(name="playlist", aliases=["pl"])
+    async def playlist(self, ctx, action: str = "list", *, name: str = None):
+        """``save``/``load``/``delete`` a named playlist, or ``list`` them."""
+        state = self.get_state(ctx.guild.id)
+        action = action.lower()
+        if action == "list":
+            names = self.playlists.names(ctx.guild.id)
+            lines = "\n".join(f"`{n}` — {t('playlist_count', n=c)}" for n, c in sorted(names.items()))
+            await ctx.send(embed=self._e(t("playlists_title"), lines or t("playlists_empty")))
+            return
+        if action not in ("save", "load", "delete") or not name:
+            await ctx.send(embed=self._err(t("err_playlist_usage")))
+            return
+        if action == "save":
+            tracks = ([state.current.track] if state.current else []) + list(state.queue)
+            if not tracks:
+                await ctx.send(embed=self._err(t("queue_empty")))
+            elif not self.playlists.put(ctx.guild.id, name, tracks):
+                await ctx.send(embed=self._err(t("err_playlist_limit", n=PLAYLISTS_PER_GUILD)))
+            else:
+                await ctx.send(embed=self._e(t("playlists_title"), t(
+                    "playlist_saved", name=name.lower(), n=len(tracks)), 0x23a55a))
+            return
+        if action == "delete":
+            if self.playlists.delete(ctx.guild.id, name):
+                await ctx.send(embed=self._e(t("playlists_title"),
+                                             t("playlist_deleted", name=name.lower()), 0xf0b232))
+            else:
+                await ctx.send(embed=self._err(t("err_playlist_missing", name=name.lower())))
+            return
+        records = self.playlists.get(ctx.guild.id, name)
+        if records is None:
+            await ctx.send(embed=self._err(t("err_playlist_missing", name=name.lower())))
+            return
+        if not await self._ensure_voice(ctx):
+            return
+        tracks = [tr for tr in (self._from_record(r, ctx.author.id) for r in records) if tr]
+        added = await self._submit(state, "enqueue", ctx, tracks)
+        await ctx.send(embed=self._e(t("playlist_added"), t(
+            "playlist_added_msg", title=name.lower(), n=added), 0x23a55a))
+
+    @commands.command(name="search", aliases=["find"])
+    async def search(self, ctx, *, query: str):
+        async with ctx.typing():
+            try:
+                tracks = await search_tracks(query, guild_id=ctx.guild.id)
+            except Exception as err:
+                await ctx.send(embed=self._err(str(err)))
+                return
+        if not tracks:
+            await ctx.send(embed=self._err(t("err_no_results")))
+            return
+        lines = "\n".join(f"`{i + 1}.` {tr.title[:60]} `{fmt_duration(tr.duration)}`"
+                          for i, tr in enumerate(tracks))
+        view = SearchView(self, ctx, tracks)
+        view.message = await ctx.send(embed=self._e(t("search_title"), lines), view=view)
+
+    async def _station(self, url, guild_id):
+        key = cache_key(url)
+        station = self._stations.get(key)
+        if station is None or station.ended:
+            track = await resolve_track(url, guild_id=guild_id)
+            if track.codec == "opus":
+                source = discord.FFmpegOpusAudio(
+                    track.stream_url, codec="copy", **FFMPEG_OPTIONS)
+            else:
+                source = discord.FFmpegOpusAudio(track.stream_url, **FFMPEG_OPTIONS)
+            station = BroadcastStation(key, track, source, self._on_station_idle)
+            self._stations[key] = station
+            station.start()
+        return station
+
+    def _on_station_idle(self, station):
+        # Called from the player thread of the last subscriber to leave.
+        self.bot.loop.call_soon_threadsafe(self._drop_station, station)
+
+    def _drop_station(self, station):
+        if self._stations.get(station.key) is station:
+            del self._stations[station.key]
+
+    @commands.command(name="radio")
+    async def radio(self, ctx, *, url: str = None):
+        """Tune into a shared broadcast of ``url``; every guild listening to
+        the same URL is fed from one FFmpeg process."""
+        state = self.get_state(ctx.guild.id)
+        if url is None or url.lower() == "stop":
+            if state.radio and state.voice_client:
+                await self._submit(state, "skip", ctx)
+                await ctx.send(embed=self._e(t("radio_title"), t("radio_stopped"), 0xf0b232))
+            else:
+                await ctx.send(embed=self._err(t("err_no_radio")))
+            return
+        if not await self._ensure_voice(ctx):
+            return
+        async with ctx.typing():
+            try:
+                if not url.startswith("http"):
+                    url = f"ytsearch:{url}"
+                station = await self._station(url, ctx.guild.id)
             except Exception as err:
                 await ctx.send(embed=self._err(str(err)))
+                return
+            await self._submit(state, "radio", ctx, station.subscribe())
+            em = self._e(t("radio_title"), t("radio_tuned", title=station.track.title,
+                                            n=station.listeners), 0x23a55a)
+            await ctx.send(embed=em)
 
     @commands.command(name="pause")
     async def pause(self, ctx):
@@ -174,8 +3039,7 @@ class MusicManager(commands.Cog, name="Music"):
     @commands.command(name="skip", aliases=["s"])
     async def skip(self, ctx):
         state = self.get_state(ctx.guild.id)
-        if state.is_playing():
-            state.voice_client.stop()
+        if await self._submit(state, "skip", ctx):
             await ctx.send(embed=self._e(t("skipped"), t("song_skipped")))
         else:
             await ctx.send(embed=self._err(t("err_no_song")))
@@ -183,24 +3047,21 @@ class MusicManager(commands.Cog, name="Music"):
     @commands.command(name="stop")
     async def stop(self, ctx):
         state = self.get_state(ctx.guild.id)
-        state.queue.clear()
-        state.loop = False
-        if state.voice_client:
-            state.voice_client.stop()
-            await state.voice_client.disconnect()
-            state.voice_client = None
+        await self._submit(state, "stop", ctx, True)
         await ctx.send(embed=self._e(t("stopped"), t("stop_msg"), 0xf23f43))
 
-    @commands.command(name="queue", aliases=["q"])
-    async def queue_cmd(self, ctx):
-        state = self.get_state(ctx.guild.id)
+    def _queue_embed(self, state, page=0):
         em = discord.Embed(title=t("queue_title"), color=0x5865F2)
+        remaining = state.queue.duration
         if state.current:
             em.add_field(name=t("now_playing_lbl"),
                          value=f"`{state.current.title}`", inline=False)
+            remaining += max(0, state.current.end - state.current.position)
         if state.queue:
-            q_list = list(state.queue)[:10]
-            lines  = "\n".join(f"`{i+1}.` {u}" for i, u in enumerate(q_list))
+            start = page * QUEUE_PAGE_SIZE
+            lines = "\n".join(
+                f"`{start + i + 1}.` {tr.title[:60]} `{fmt_duration(tr.duration)}`"
+                for i, tr in enumerate(state.queue.slice(start, start + QUEUE_PAGE_SIZE)))
             em.add_field(name=t("next_songs", n=len(state.queue)),
                          value=lines, inline=False)
         else:
@@ -208,8 +3069,19 @@ class MusicManager(commands.Cog, name="Music"):
         em.add_field(name=t("loop_lbl"),
                      value=t("loop_on") if state.loop else t("loop_off"))
         em.add_field(name=t("volume_lbl"), value=f"{int(state.volume * 100)}%")
-        em.set_footer(text=t("footer_music"))
-        await ctx.send(embed=em)
+        em.add_field(name=t("remaining_lbl"), value=f"`{fmt_duration(remaining)}`")
+        pages = max(1, math.ceil(len(state.queue) / QUEUE_PAGE_SIZE))
+        em.set_footer(text=f"{t('footer_music')} • {t('queue_page', p=page + 1, n=pages)}")
+        return em
+
+    @commands.command(name="queue", aliases=["q"])
+    async def queue_cmd(self, ctx):
+        state = self.get_state(ctx.guild.id)
+        if len(state.queue) <= QUEUE_PAGE_SIZE:
+            await ctx.send(embed=self._queue_embed(state))
+            return
+        view = QueueView(self, state)
+        view.message = await ctx.send(embed=self._queue_embed(state), view=view)
 
     @commands.command(name="volume", aliases=["vol"])
     async def volume(self, ctx, vol: int):
@@ -220,36 +3092,181 @@ class MusicManager(commands.Cog, name="Music"):
         state.volume = vol / 100
         if state.current:
             state.current.volume = state.volume
+            if state.current.is_opus():
+                await self._submit(state, "reopen", ctx)
         await ctx.send(embed=self._e(t("vol_title"), t("vol_set", vol=vol), 0x23a55a))
 
+    @commands.command(name="bassboost", aliases=["bass"])
+    async def bassboost(self, ctx, db: int):
+        state = self.get_state(ctx.guild.id)
+        if not 0 <= db <= 12:
+            await ctx.send(embed=self._err(t("err_bass_range")))
+            return
+        if np is None or sosfilt is None:
+            await ctx.send(embed=self._err(t("err_no_numpy")))
+            return
+        state.bass_db = float(db)
+        if state.current:
+            if not state.current.set_bass(state.bass_db) \
+                    or state.current.is_opus() != self._uses_opus(state):
+                await self._submit(state, "reopen", ctx, self._uses_opus(state))
+        await ctx.send(embed=self._e(t("bass_title"), t("bass_set", db=db), 0x23a55a))
+
+    @commands.command(name="crossfade", aliases=["xf"])
+    async def crossfade(self, ctx, seconds: int):
+        state = self.get_state(ctx.guild.id)
+        if not 0 <= seconds <= CROSSFADE_MAX:
+            await ctx.send(embed=self._err(t("err_xf_range", max=CROSSFADE_MAX)))
+            return
+        if seconds and np is None:
+            await ctx.send(embed=self._err(t("err_no_numpy")))
+            return
+        state.crossfade = seconds
+        if state.mixer:
+            state.mixer.seconds = seconds
+        msg = t("xf_set", s=seconds) if seconds else t("xf_off")
+        await ctx.send(embed=self._e(t("xf_title"), msg, 0x23a55a))
+
+    @commands.command(name="dsp")
+    async def dsp_cmd(self, ctx):
+        state = self.get_state(ctx.guild.id)
+        dsp = state.current.dsp if state.current else None
+        buf = state.current.buffer if state.current else None
+        if dsp is None and buf is None:
+            await ctx.send(embed=self._e(t("dsp_title"), t("dsp_inactive")))
+            return
+        em = self._e(t("dsp_title"))
+        for stage in (dsp.stages if dsp else ()):
+            em.add_field(name=stage.name, value=f"`{stage.cpu_us:.1f} µs`")
+        if buf:
+            em.add_field(name=t("buffer_lbl"),
+                         value=t("buffer_stats", depth=f"{buf.depth:.1f}", n=buf.underruns))
+        await ctx.send(embed=em)
+
+    @commands.command(name="autoplay", aliases=["ap"])
+    async def autoplay_cmd(self, ctx):
+        if self.autoplay is None:
+            await ctx.send(embed=self._err(t("err_autoplay_deps")))
+            return
+        state = self.get_state(ctx.guild.id)
+        state.autoplay = not state.autoplay
+        status = t("autoplay_on") if state.autoplay else t("autoplay_off")
+        color  = 0x23a55a if state.autoplay else 0xf23f43
+        await ctx.send(embed=self._e(t("autoplay_title"), status, color))
+        if state.autoplay and state.voice_client and not (state.is_playing() or state.is_paused()):
+            await self._submit(state, "enqueue", ctx, [])
+
     @commands.command(name="loop")
     async def loop_cmd(self, ctx):
         state = self.get_state(ctx.guild.id)
         state.loop = not state.loop
+        if state.loop:
+            self._maybe_cache(state)
         status = t("loop_status_on") if state.loop else t("loop_status_off")
         color  = 0x23a55a if state.loop else 0xf23f43
         await ctx.send(embed=self._e(t("loop_title"), status, color))
 
     @commands.command(name="nowplaying", aliases=["np"])
     async def now_playing(self, ctx):
+        """Post a fresh now-playing message here; it becomes the live one."""
         state = self.get_state(ctx.guild.id)
         if state.current:
-            dur = f"{state.current.duration // 60}:{state.current.duration % 60:02d}"
-            em  = self._e(t("now_playing"), f"**[{state.current.title}]({state.current.url})**")
-            em.add_field(name=t("duration"), value=f"`{dur}`")
-            em.add_field(name=t("volume_lbl"), value=f"`{int(state.volume * 100)}%`")
-            em.add_field(name=t("loop_lbl"),
-                         value=t("loop_on") if state.loop else t("loop_off"))
-            if state.current.thumbnail:
-                em.set_thumbnail(url=state.current.thumbnail)
-            await ctx.send(embed=em)
+            state.np_message = await ctx.send(embed=self._np_embed(state.current, state))
+            state.np_edited_at = time.monotonic()
         else:
             await ctx.send(embed=self._err(t("err_no_song")))
 
+    @commands.command(name="previous", aliases=["prev", "back"])
+    async def previous(self, ctx):
+        if not await self._ensure_voice(ctx):
+            return
+        state = self.get_state(ctx.guild.id)
+        try:
+            track = await self._submit(state, "previous", ctx)
+        except Exception as err:
+            await ctx.send(embed=self._err(str(err)))
+            return
+        if track is None:
+            await ctx.send(embed=self._err(t("err_no_history")))
+
+    @commands.command(name="replay")
+    async def replay(self, ctx):
+        if not await self._ensure_voice(ctx):
+            return
+        state = self.get_state(ctx.guild.id)
+        try:
+            track = await self._submit(state, "replay", ctx)
+        except Exception as err:
+            await ctx.send(embed=self._err(str(err)))
+            return
+        if track is None:
+            await ctx.send(embed=self._err(t("err_no_history")))
+
+    @commands.command(name="history", aliases=["hist"])
+    async def history(self, ctx):
+        state = self.get_state(ctx.guild.id)
+        if not state.history:
+            await ctx.send(embed=self._e(t("history_title"), t("history_empty")))
+            return
+        recent = list(reversed(state.history))[:QUEUE_PAGE_SIZE]
+        lines  = "\n".join(f"`{i + 1}.` {tr.title[:60]} `{fmt_duration(tr.duration)}`"
+                           for i, tr in enumerate(recent))
+        await ctx.send(embed=self._e(t("history_title"), lines))
+
+    @commands.command(name="playnext", aliases=["pn"])
+    async def playnext(self, ctx, *, query: str):
+        if not await self._ensure_voice(ctx):
+            return
+        state = self.get_state(ctx.guild.id)
+        async with ctx.typing():
+            try:
+                if query.startswith("local:"):
+                    await self._queue_local(ctx, state, query[len("local:"):], front=True)
+                    return
+                url = query if query.startswith("http") else f"ytsearch:{query}"
+                await self._queue_url(ctx, state, url, front=True)
+            except Exception as err:
+                await ctx.send(embed=self._err(str(err)))
+
+    @commands.command(name="remove", aliases=["rm"])
+    async def remove(self, ctx, index: int):
+        state = self.get_state(ctx.guild.id)
+        if not 1 <= index <= len(state.queue):
+            await ctx.send(embed=self._err(t("err_queue_index", n=len(state.queue))))
+            return
+        head = state.queue[0]
+        track = state.queue.remove(index - 1)
+        self._head_changed(state, head)
+        await ctx.send(embed=self._e(t("removed_title"), t("removed_msg", title=track.title), 0xf0b232))
+
+    @commands.command(name="move", aliases=["mv"])
+    async def move(self, ctx, src: int, dst: int):
+        state = self.get_state(ctx.guild.id)
+        n = len(state.queue)
+        if not (1 <= src <= n and 1 <= dst <= n):
+            await ctx.send(embed=self._err(t("err_queue_index", n=n)))
+            return
+        head = state.queue[0]
+        track = state.queue.move(src - 1, dst - 1)
+        self._head_changed(state, head)
+        await ctx.send(embed=self._e(t("moved_title"), t("moved_msg", title=track.title, pos=dst), 0x23a55a))
+
+    @commands.command(name="shuffle")
+    async def shuffle(self, ctx):
+        state = self.get_state(ctx.guild.id)
+        if not state.queue:
+            await ctx.send(embed=self._err(t("queue_empty")))
+            return
+        head = state.queue[0]
+        state.queue.shuffle()
+        self._head_changed(state, head)
+        await ctx.send(embed=self._e(t("shuffled_title"), t("shuffled_msg", n=len(state.queue)), 0x23a55a))
+
     @commands.command(name="clear_queue", aliases=["cq"])
     async def clear_queue(self, ctx):
         state = self.get_state(ctx.guild.id)
         state.queue.clear()
+        state.drop_prefetch()
         await ctx.send(embed=self._e(t("queue_clear_t"), t("queue_cleared"), 0xf0b232))
 
     @commands.command(name="join")
@@ -262,8 +3279,7 @@ class MusicManager(commands.Cog, name="Music"):
     async def leave(self, ctx):
         state = self.get_state(ctx.guild.id)
         if state.voice_client:
-            await state.voice_client.disconnect()
-            state.voice_client = None
+            await self._submit(state, "stop", ctx, False)
             await ctx.send(embed=self._e(t("disconnected"), t("disconnected_msg"), 0xf0b232))
 
 